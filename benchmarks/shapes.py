@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from headless import HeadlessWindow
+from classes.vector import Vector2
+
+# Сколько статических форм pymunk на сгенерированных картах:
+# рёбра, разрезанные по чанкам, против объединённых Map.static_geometry.
+#   python benchmarks/shapes.py [seed ...]
+
+def count(game, seed, size=(128, 256)):
+    state = game.game_state()
+    state.map.chunk_manager.clear()
+    cache = state.world_cache
+    state.world_cache = None
+    state.map_generate(size, seed=seed)
+    state.world_cache = cache
+
+    map = state.map
+    map.bake_all_physics()
+    edges = sum(len(chunk.edge_segments) for chunk in map.all_chunks())
+    shapes = map.static_geometry.shape_count
+
+    # Локальное изменение пересобирает только свои линии
+    rebuilt = map.static_geometry.rebuilt_lines
+    start = time.perf_counter()
+    map.carve_circle(map.size / 2, 2)
+    map.flush()
+    map.static_geometry.flush()
+    dig = time.perf_counter() - start
+    return edges, shapes, map.static_geometry.rebuilt_lines - rebuilt, dig
+
+def main(seeds):
+    game = HeadlessWindow(seeds[0])
+    game.start()
+    print("%6s %10s %10s %8s %14s %10s" % ("seed", "per chunk", "merged", "-%", "dig lines", "dig, ms"))
+    for seed in seeds:
+        edges, shapes, lines, dig = count(game, seed)
+        print("%6d %10d %10d %8.1f %14d %10.3f" % (seed, edges, shapes, (1 - shapes / edges) * 100, lines, dig * 1000))
+
+if __name__ == "__main__":
+    main([int(seed) for seed in sys.argv[1:]] or [1, 2, 3, 4, 5])
@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT) # ресурсы грузятся по относительным путям
+
+import numpy as np
+import pygame
+
+from headless import HeadlessWindow
+from classes.vector import Vector2
+from entlist import EntList, Light
+import enemies
+import vector as vector_bench
+
+# Набор бенчмарков на headless-окне.
+#   python benchmarks/suite.py [--scenario stress] [--out result.json]
+#   python benchmarks/suite.py --baseline baseline.json [--threshold 0.2]
+# Время везде в секундах на одну операцию, лучшее из repeat запусков.
+# С --baseline выход с кодом 1, если что-то стало медленнее больше чем на threshold
+
+SCENARIOS = {
+    "small": {"map_size": [64, 128], "enemies": 10, "lights": 4},
+    "default": {"map_size": [128, 256], "enemies": 100, "lights": 16},
+    "stress": {"map_size": [256, 512], "enemies": 1000, "lights": 64},
+}
+
+LIGHT_RADII = (32, 64, 100, 160)
+ENEMY_COUNTS = (10, 100, 1000)
+VECTOR_CASES = ("create", "add", "mul scalar", "length", "normalized", "distance", "pos chain")
+
+def measure(fn, repeat=5, number=1, setup=None):
+    best = None
+    for i in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for j in range(number):
+            fn()
+        t = (time.perf_counter() - start) / number
+        best = t if best is None else min(best, t)
+    return best
+
+def empty_cells(map, count, rnd):
+    # Пустые клетки карты (в тайлах), центр клетки
+    cells = np.argwhere(map.data == 0).tolist()
+    cells = rnd.sample(cells, min(count, len(cells)))
+    return [Vector2(x + 0.5, y + 0.5) for y, x in cells]
+
+def bench_map(game, scenario, results, repeat):
+    state = game.game_state()
+    size = tuple(scenario["map_size"])
+    seed = scenario["seed"]
+
+    # Кэш мира выключен, иначе меряется чтение с диска
+    cache = state.world_cache
+    state.world_cache = None
+    def generate():
+        state.map.chunk_manager.clear()
+        state.map_generate(size, seed=seed)
+    results["map_generate"] = measure(generate, repeat)
+    state.world_cache = cache
+
+    results["bake_all"] = measure(state.map.bake_all, repeat)
+
+    def unbake():
+        for chunk in state.map.all_chunks():
+            if chunk.baked:
+                chunk.delete_physics()
+            chunk.pending_edges = None
+    # Физика всей карты остаётся запечённой для остальных бенчмарков
+    results["bake_all_physics"] = measure(state.map.bake_all_physics, repeat, setup=unbake)
+
+def bench_lights(game, scenario, results, repeat, rnd):
+    state = game.game_state()
+    positions = empty_cells(state.map, max(scenario["lights"], 1), rnd)
+    for radius in LIGHT_RADII:
+        lights = []
+        for pos in positions:
+            light = Light(radius)
+            light.game = game
+            light.pos = pos * 8
+            lights.append(light)
+        def project():
+            for light in lights:
+                light.project_light()
+        results["project_light_r%d" % radius] = measure(project, repeat) / len(lights)
+
+def bench_entities(game, scenario, results, repeat, rnd, ticks=30):
+    state = game.game_state()
+    dt = 1/60
+    for count in ENEMY_COUNTS:
+        entlist = EntList(game, state)
+        for pos in empty_cells(state.map, count, rnd):
+            entlist.push(enemies.IceSlime(pos))
+        entlist.update(dt)
+
+        best = None
+        for i in range(repeat):
+            total = 0
+            for j in range(ticks):
+                game.space.step(dt) # физика не входит во время
+                start = time.perf_counter()
+                entlist.update(dt)
+                total += time.perf_counter() - start
+            best = total / ticks if best is None else min(best, total / ticks)
+        results["entlist_update_%d" % count] = best
+
+        for ent in list(entlist.get_all()):
+            ent.remove() # тело уходит из space и из game.physics
+        entlist.remove_all()
+
+def bench_ticks(game, scenario, results, repeat, rnd, ticks=60):
+    # Целый кадр игры со сценарием: enemies слаймов и lights источников света
+    state = game.game_state()
+    cells = empty_cells(state.map, scenario["enemies"] + scenario["lights"], rnd)
+    for pos in cells[:scenario["enemies"]]:
+        state.entities.push(enemies.IceSlime(pos))
+    for pos in cells[scenario["enemies"]:]:
+        light = state.entities.push(Light(64, (255, 200, 150)))
+        light.pos = pos * 8
+    game.run_ticks(ticks)
+
+    results["tick"] = measure(lambda: game.run_ticks(1), repeat, ticks)
+    results["tick_render"] = measure(lambda: game.run_ticks(1, render=True), repeat, ticks)
+
+def bench_vector(results):
+    cases = dict(vector_bench.CASES)
+    for name in VECTOR_CASES:
+        results["vector_" + name.replace(" ", "_")] = vector_bench.run_case(Vector2, cases[name], 20000)
+
+def run(scenario, repeat=5):
+    rnd = random.Random(scenario["seed"])
+    game = HeadlessWindow(scenario["seed"])
+    game.start()
+
+    results = {}
+    bench_map(game, scenario, results, repeat)
+    bench_lights(game, scenario, results, repeat, rnd)
+    bench_entities(game, scenario, results, repeat, rnd)
+    bench_ticks(game, scenario, results, repeat, rnd)
+    bench_vector(results)
+    return results
+
+def compare(results, baseline, threshold):
+    # Список (имя, было, стало, во сколько раз медленнее) для регрессий
+    regressions = []
+    for name, base in baseline.items():
+        new = results.get(name)
+        if new is None or not base:
+            continue
+        if new / base > 1 + threshold:
+            regressions.append((name, base, new, new / base))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+    parser.add_argument("--scenario", default="default", choices=sorted(SCENARIOS))
+    parser.add_argument("--map-size", type=int, nargs=2, metavar=("W", "H"))
+    parser.add_argument("--enemies", type=int)
+    parser.add_argument("--lights", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from a previous --out")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    scenario = dict(SCENARIOS[args.scenario], name=args.scenario, seed=args.seed)
+    if args.map_size:
+        scenario["map_size"] = args.map_size
+    if args.enemies is not None:
+        scenario["enemies"] = args.enemies
+    if args.lights is not None:
+        scenario["lights"] = args.lights
+
+    results = run(scenario, args.repeat)
+    report = {
+        "scenario": scenario,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "results": results
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("scenario") != scenario:
+            print("warning: baseline was made with a different scenario", file=sys.stderr)
+
+    print("%-28s %14s %14s %8s" % ("benchmark", "ms", "base, ms", "x"))
+    for name, t in results.items():
+        base = baseline["results"].get(name) if baseline else None
+        if base:
+            print("%-28s %14.6f %14.6f %8.2f" % (name, t * 1000, base * 1000, t / base))
+        else:
+            print("%-28s %14.6f" % (name, t * 1000))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if baseline:
+        regressions = compare(results, baseline["results"], args.threshold)
+        for name, base, new, ratio in regressions:
+            print("REGRESSION %s: %.6f ms -> %.6f ms (x%.2f)" % (name, base * 1000, new * 1000, ratio))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
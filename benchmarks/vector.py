@@ -0,0 +1,66 @@
+import os
+import sys
+import math
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classes.vector import Vector2
+from classes.vec2array import Vec2Array
+import legacy_vector
+
+# Микробенчмарк Vector2: старая версия против новой.
+#   python benchmarks/vector.py [number]
+
+CASES = [
+    ("create", "V(1.5, 2.5)"),
+    ("create copy", "V(a)"),
+    ("add", "a + b"),
+    ("sub scalar", "a - 3"),
+    ("mul scalar", "a * 0.5"),
+    ("div", "a / b"),
+    ("attr read", "a.x + a.y"),
+    ("length", "a.length"),
+    ("normalized", "a.normalized"),
+    ("distance", "a.distance(b)"),
+    ("dot", "a.dot(b)"),
+    ("floor", "math.floor(a)"),
+    ("list", "a.list"),
+    ("pos chain", "(a - b * 0.5 + V(1)).list"),
+]
+
+def run_case(cls, stmt, number):
+    env = {"V": cls, "a": cls(3.25, -7.5), "b": cls(1.5, 2.0), "math": math}
+    return min(timeit.repeat(stmt, globals=env, number=number, repeat=5)) / number
+
+def run_batch(count, number):
+    points = [Vector2(i * 0.5, -i * 0.25) for i in range(count)]
+    offset = Vector2(10, 20)
+    array = Vec2Array(points)
+
+    def loop():
+        return [(p - offset) * 0.5 for p in points]
+
+    def batch():
+        return (array - offset) * 0.5
+
+    t_loop = min(timeit.repeat(loop, number=number, repeat=5)) / number
+    t_batch = min(timeit.repeat(batch, number=number, repeat=5)) / number
+    return t_loop, t_batch
+
+def main(number=100000):
+    print("%-14s %12s %12s %8s" % ("case", "old, ns", "new, ns", "x"))
+    for name, stmt in CASES:
+        old = run_case(legacy_vector.Vector2, stmt, number)
+        new = run_case(Vector2, stmt, number)
+        print("%-14s %12.1f %12.1f %8.2f" % (name, old * 1e9, new * 1e9, old / new))
+
+    print()
+    print("%-14s %12s %12s %8s" % ("transform", "loop, us", "array, us", "x"))
+    for count in (10, 100, 1000, 10000):
+        t_loop, t_batch = run_batch(count, max(number // count, 10))
+        print("%-14d %12.1f %12.1f %8.2f" % (count, t_loop * 1e6, t_batch * 1e6, t_loop / t_batch))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,168 @@
+from collections import OrderedDict
+from classes.vector import Vector2
+from classes.aabb import AABB
+from chunkworker import ChunkWorker
+
+class ChunkManager():
+    """
+        Bakes chunk surfaces only around the camera view and chunk physics
+        only around the view and physically active entities.
+        Chunks that are no longer needed stay resident until the budgets
+        are exceeded, then the least recently used ones are evicted.
+        With workers > 0 baking goes through a ChunkWorker; only chunks
+        that an entity is standing in are baked synchronously.
+    """
+
+    def __init__(self, map, surface_budget=32*1024*1024, physics_budget=64, view_margin=1, physics_margin=1,
+                 workers=0, commit_budget=0.004):
+        self.map = map
+        self.surface_budget = surface_budget # байты
+        self.physics_budget = physics_budget # чанки с физикой
+        self.view_margin = view_margin # чанки вокруг камеры
+        self.physics_margin = physics_margin # чанки вокруг PhysEntity
+
+        self.surfaces = OrderedDict() # chunk -> байты, от старых к новым
+        self.physics = OrderedDict() # chunk -> True
+
+        self.worker = ChunkWorker(workers) if workers else None
+        self.commit_budget = commit_budget # секунды за кадр
+
+        self.surface_bytes = 0
+        self.counters = {
+            "surface_bakes": 0,
+            "surface_evictions": 0,
+            "physics_bakes": 0,
+            "physics_evictions": 0
+        }
+
+    def chunks_around(self, aabb, margin):
+        offset = Vector2(margin * self.map.chunksize.x * 8, margin * self.map.chunksize.y * 8)
+        return self.map.test_aabb_chunks(AABB(aabb.min - offset, aabb.max + offset))
+
+    def ensure_surface(self, chunk):
+        if chunk in self.surfaces:
+            self.surfaces.move_to_end(chunk)
+            return
+        if chunk.surface is None:
+            if self.worker:
+                self.worker.submit(chunk, "surface")
+                return
+            chunk.bake()
+            self.counters["surface_bakes"] += 1
+        self.register_surface(chunk)
+
+    def register_surface(self, chunk):
+        size = chunk.surface.get_bytesize() * chunk.surface.get_width() * chunk.surface.get_height()
+        self.surfaces[chunk] = size
+        self.surface_bytes += size
+
+    def ensure_physics(self, chunk, urgent=False):
+        if chunk in self.physics:
+            self.physics.move_to_end(chunk)
+            return
+        if not chunk.baked:
+            if self.worker and not urgent:
+                self.worker.submit(chunk, "physics")
+                return
+            if self.worker:
+                self.worker.wait(chunk, "physics")
+            if not chunk.baked:
+                chunk.bake_physics()
+            self.counters["physics_bakes"] += 1
+        self.physics[chunk] = True
+
+    def register(self, jobs):
+        for job in jobs:
+            if job.kind == "surface":
+                self.counters["surface_bakes"] += 1
+                if job.chunk not in self.surfaces:
+                    self.register_surface(job.chunk)
+            else:
+                self.counters["physics_bakes"] += 1
+                self.physics[job.chunk] = True
+
+    def commit(self):
+        if self.worker:
+            self.register(self.worker.commit(self.commit_budget))
+
+    def flush(self):
+        # Дождаться всех задач (например, при загрузке мира)
+        if self.worker:
+            self.register(self.worker.flush())
+
+    def evict_surface(self, chunk):
+        self.surface_bytes -= self.surfaces.pop(chunk)
+        chunk.evict_surface()
+        self.counters["surface_evictions"] += 1
+
+    def evict_physics(self, chunk):
+        del self.physics[chunk]
+        chunk.delete_physics()
+        self.counters["physics_evictions"] += 1
+
+    def update(self, view, entities):
+        self.commit()
+
+        visible = self.chunks_around(view, self.view_margin)
+        for chunk in visible:
+            self.ensure_surface(chunk)
+
+        # Тени считаются по сегментам физики, поэтому она нужна и вокруг камеры
+        # Порядок обхода не зависит от id() чанков, чтобы физика
+        # добавлялась в space одинаково от запуска к запуску
+        active = dict.fromkeys(visible)
+        urgent = set()
+        for ent in entities:
+            if getattr(ent, "body", None) is None:
+                continue
+            half = ent.size / 2
+            pos = ent.pos
+            aabb = AABB(pos - half, pos + half)
+            urgent.update(self.chunks_around(aabb, 0))
+            active.update(dict.fromkeys(self.chunks_around(aabb, self.physics_margin)))
+        for chunk in active:
+            self.ensure_physics(chunk, chunk in urgent)
+
+        visible = set(visible)
+        for chunk in list(self.surfaces):
+            if self.surface_bytes <= self.surface_budget:
+                break
+            if chunk not in visible:
+                self.evict_surface(chunk)
+
+        for chunk in list(self.physics):
+            if len(self.physics) <= self.physics_budget:
+                break
+            if chunk not in active:
+                self.evict_physics(chunk)
+
+        # Новые, изменённые и выгруженные чанки - в формы pymunk до следующего шага
+        self.map.static_geometry.flush()
+
+    def clear(self):
+        if self.worker:
+            self.worker.cancel_all()
+        for chunk in list(self.surfaces):
+            self.evict_surface(chunk)
+        for chunk in list(self.physics):
+            self.evict_physics(chunk)
+        self.map.static_geometry.flush()
+
+    def shutdown(self):
+        # Карта заменяется: формы уходят из space, пул воркеров закрывается
+        self.clear()
+        if self.worker:
+            self.worker.shutdown()
+            self.worker = None
+
+    def stats(self):
+        stats = {
+            "surfaces": len(self.surfaces),
+            "surface_bytes": self.surface_bytes,
+            "physics": len(self.physics),
+            "edges": sum(len(chunk.edge_segments) for chunk in self.physics),
+            "shapes": self.map.static_geometry.shape_count,
+            "jobs": len(self.worker.jobs) if self.worker else 0
+        }
+        stats.update(self.counters)
+        return stats
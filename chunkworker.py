@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import time
+
+import tilemap
+
+class ChunkJob():
+
+    def __init__(self, chunk, kind, version, future):
+        self.chunk = chunk
+        self.kind = kind
+        self.version = version
+        self.future = future
+
+class ChunkWorker():
+    """
+        Runs the pure-data part of chunk baking (autotile selection,
+        edge extraction, shadow segments) in a thread pool.
+        Finished jobs wait in a queue and are applied on the main thread
+        by commit() within a time budget.
+    """
+
+    def __init__(self, workers=2):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = {} # (chunk, kind) -> ChunkJob
+        self.done = deque()
+
+    def pending(self, chunk, kind):
+        return (chunk, kind) in self.jobs
+
+    def submit(self, chunk, kind):
+        if (chunk, kind) in self.jobs:
+            return
+        # Массивы копируются здесь, в главном потоке
+        if kind == "surface":
+            future = self.executor.submit(tilemap.prepare_tiles, *chunk.tile_snapshot())
+        else:
+            future = self.executor.submit(
+                tilemap.prepare_physics, chunk.solid_mask(),
+                chunk.pos.x * chunk.size.x, chunk.pos.y * chunk.size.y,
+                chunk.pending_edges
+            )
+        job = ChunkJob(chunk, kind, chunk.version, future)
+        self.jobs[(chunk, kind)] = job
+        future.add_done_callback(lambda f: self.done.append(job))
+
+    def apply(self, job):
+        # Возвращает True, если результат попал в чанк
+        if self.jobs.get((job.chunk, job.kind)) is not job:
+            return False
+        del self.jobs[(job.chunk, job.kind)]
+
+        chunk = job.chunk
+        if job.version != chunk.version:
+            # Тайлы поменялись, пока задача считалась
+            self.submit(chunk, job.kind)
+            return False
+
+        if job.kind == "surface":
+            if chunk.surface is not None:
+                return False
+            chunk.apply_surface(job.future.result())
+        else:
+            if chunk.baked:
+                return False
+            chunk.apply_physics(job.future.result())
+        return True
+
+    def commit(self, budget=0.004):
+        # Применяет готовые задачи, пока не кончится бюджет времени (в секундах).
+        # Хотя бы одна задача применяется всегда, чтобы очередь не стояла
+        applied = []
+        start = time.perf_counter()
+        while self.done:
+            job = self.done.popleft()
+            if self.apply(job):
+                applied.append(job)
+            if time.perf_counter() - start > budget:
+                break
+        return applied
+
+    def wait(self, chunk, kind):
+        job = self.jobs.get((chunk, kind))
+        if job is None:
+            return None
+        job.future.result()
+        if self.apply(job):
+            return job
+        return None
+
+    def cancel(self, chunk):
+        for kind in ("surface", "physics"):
+            job = self.jobs.pop((chunk, kind), None)
+            if job:
+                job.future.cancel()
+
+    def cancel_all(self):
+        for job in self.jobs.values():
+            job.future.cancel()
+        self.jobs = {}
+        self.done.clear()
+
+    def flush(self):
+        applied = []
+        while self.jobs:
+            job = next(iter(self.jobs.values()))
+            job.future.result()
+            if self.apply(job):
+                applied.append(job)
+        self.done.clear()
+        return applied
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.jobs = {}
+        self.done.clear()
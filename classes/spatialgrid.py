@@ -0,0 +1,258 @@
+from math import floor, sqrt
+import heapq
+
+class SpatialGrid():
+    """
+        Uniform grid of cell_size x cell_size cells keyed by integer (x, y)
+        tuples. Every object is stored with its bounds (x0, y0, x1, y1) and
+        is moved between cells only when its range of cells changes.
+        Queries mark visited objects with a per-query stamp instead of
+        collecting them into sets.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {} # (x, y) -> {obj: None}
+        self.bounds = {} # obj -> (x0, y0, x1, y1)
+        self.ranges = {} # obj -> (cx0, cy0, cx1, cy1)
+        self.marks = {} # obj -> stamp последнего запроса, который его видел
+        self.stamp = 0
+        self.moves = 0
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __contains__(self, obj):
+        return obj in self.bounds
+
+    def cell_range(self, bounds):
+        cs = self.cell_size
+        return (
+            floor(bounds[0] / cs), floor(bounds[1] / cs),
+            floor(bounds[2] / cs), floor(bounds[3] / cs)
+        )
+
+    def link(self, obj, rng):
+        cells = self.cells
+        for y in range(rng[1], rng[3]+1):
+            for x in range(rng[0], rng[2]+1):
+                cell = cells.get((x, y))
+                if cell is None:
+                    cell = cells[(x, y)] = {}
+                cell[obj] = None
+
+    def unlink(self, obj, rng):
+        cells = self.cells
+        for y in range(rng[1], rng[3]+1):
+            for x in range(rng[0], rng[2]+1):
+                cell = cells[(x, y)]
+                del cell[obj]
+                if not cell:
+                    del cells[(x, y)]
+
+    def update(self, obj, bounds):
+        if bounds is None:
+            self.remove(obj)
+            return
+        self.bounds[obj] = bounds
+        rng = self.cell_range(bounds)
+        old = self.ranges.get(obj)
+        if old == rng:
+            return
+        if old is not None:
+            self.unlink(obj, old)
+        self.link(obj, rng)
+        self.ranges[obj] = rng
+        self.moves += 1
+
+    def remove(self, obj):
+        rng = self.ranges.pop(obj, None)
+        if rng is None:
+            return
+        self.unlink(obj, rng)
+        del self.bounds[obj]
+        self.marks.pop(obj, None)
+
+    def clear(self):
+        self.cells = {}
+        self.bounds = {}
+        self.ranges = {}
+        self.marks = {}
+
+    def set_cell_size(self, cell_size):
+        bounds = self.bounds
+        self.clear()
+        self.cell_size = cell_size
+        for obj, b in bounds.items():
+            self.update(obj, b)
+
+    def next_stamp(self):
+        self.stamp += 1
+        return self.stamp
+
+    def visit(self, x0, y0, x1, y1):
+        # Непустые клетки, пересекающие прямоугольник
+        cx0, cy0, cx1, cy1 = self.cell_range((x0, y0, x1, y1))
+        cells = self.cells
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(cells):
+            for (x, y), cell in cells.items():
+                if cx0 <= x <= cx1 and cy0 <= y <= cy1:
+                    yield cell
+            return
+        for y in range(cy0, cy1+1):
+            for x in range(cx0, cx1+1):
+                cell = cells.get((x, y))
+                if cell is not None:
+                    yield cell
+
+    def query_aabb(self, x0, y0, x1, y1, cls=None):
+        result = []
+        stamp = self.next_stamp()
+        marks = self.marks
+        bounds = self.bounds
+        for cell in self.visit(x0, y0, x1, y1):
+            for obj in cell:
+                if marks.get(obj) == stamp:
+                    continue
+                marks[obj] = stamp
+                if cls is not None and not isinstance(obj, cls):
+                    continue
+                b = bounds[obj]
+                if b[0] <= x1 and b[2] >= x0 and b[1] <= y1 and b[3] >= y0:
+                    result.append(obj)
+        return result
+
+    def distance2(self, obj, x, y):
+        # Квадрат расстояния от точки до границ объекта (0 внутри)
+        b = self.bounds[obj]
+        dx = max(b[0] - x, 0, x - b[2])
+        dy = max(b[1] - y, 0, y - b[3])
+        return dx*dx + dy*dy
+
+    def query_radius(self, x, y, radius, cls=None):
+        result = []
+        stamp = self.next_stamp()
+        marks = self.marks
+        r2 = radius * radius
+        for cell in self.visit(x - radius, y - radius, x + radius, y + radius):
+            for obj in cell:
+                if marks.get(obj) == stamp:
+                    continue
+                marks[obj] = stamp
+                if cls is not None and not isinstance(obj, cls):
+                    continue
+                if self.distance2(obj, x, y) <= r2:
+                    result.append(obj)
+        return result
+
+    def query_sectors(self, sectors, cls=None, get_bounds=None, margin=0):
+        # sectors - [(x, y, dx, dy, cos_half, radius, exclude)], (dx, dy) нормирован.
+        # Объект попадает в сектор, если туда попал центр его границ.
+        # get_bounds(obj) - текущие границы вместо сохранённых в сетке, тогда
+        # клетки берутся с запасом margin на сдвиг с последнего update.
+        # Клетки всех секторов обходятся за один проход, тригонометрии нет
+        results = [[] for sector in sectors]
+        if not sectors:
+            return results
+        stamp = self.next_stamp()
+        marks = self.marks
+        bounds = self.bounds
+        cells = self.cells
+
+        keys = {}
+        for x, y, dx, dy, cos_half, radius, exclude in sectors:
+            r = radius + margin
+            cx0, cy0, cx1, cy1 = self.cell_range((x - r, y - r, x + r, y + r))
+            for cy in range(cy0, cy1+1):
+                for cx in range(cx0, cx1+1):
+                    keys[(cx, cy)] = None
+
+        for key in keys:
+            cell = cells.get(key)
+            if cell is None:
+                continue
+            for obj in cell:
+                if marks.get(obj) == stamp:
+                    continue
+                marks[obj] = stamp
+                if cls is not None and not isinstance(obj, cls):
+                    continue
+                b = bounds[obj] if get_bounds is None else get_bounds(obj)
+                if b is None:
+                    continue
+                ox = (b[0] + b[2]) * 0.5
+                oy = (b[1] + b[3]) * 0.5
+                for i, (x, y, dx, dy, cos_half, radius, exclude) in enumerate(sectors):
+                    if obj is exclude:
+                        continue
+                    vx = ox - x
+                    vy = oy - y
+                    d2 = vx*vx + vy*vy
+                    if d2 > radius * radius:
+                        continue
+                    if d2 == 0:
+                        # Точно в вершине сектора - попадание при любом направлении
+                        results[i].append(obj)
+                        continue
+                    dot = vx*dx + vy*dy
+                    if dot < 0 and cos_half >= 0:
+                        continue
+                    if dot >= cos_half * sqrt(d2):
+                        results[i].append(obj)
+        return results
+
+    def ring(self, cx, cy, r):
+        if r == 0:
+            yield cx, cy
+            return
+        for x in range(cx - r, cx + r + 1):
+            yield x, cy - r
+            yield x, cy + r
+        for y in range(cy - r + 1, cy + r):
+            yield cx - r, y
+            yield cx + r, y
+
+    def nearest(self, x, y, k=1, max_radius=None, cls=None):
+        # k ближайших объектов, от ближнего к дальнему.
+        # Клетки обходятся кольцами вокруг точки, пока k-й найденный
+        # не окажется ближе любого ещё не просмотренного
+        total = len(self.bounds)
+        if k <= 0 or total == 0:
+            return []
+        stamp = self.next_stamp()
+        marks = self.marks
+        cells = self.cells
+        cs = self.cell_size
+        max_r2 = None if max_radius is None else max_radius * max_radius
+
+        found = []
+        seen = 0
+        cx, cy = floor(x / cs), floor(y / cs)
+        r = 0
+        while True:
+            for key in self.ring(cx, cy, r):
+                cell = cells.get(key)
+                if cell is None:
+                    continue
+                for obj in cell:
+                    if marks.get(obj) == stamp:
+                        continue
+                    marks[obj] = stamp
+                    seen += 1
+                    if cls is not None and not isinstance(obj, cls):
+                        continue
+                    d2 = self.distance2(obj, x, y)
+                    if max_r2 is not None and d2 > max_r2:
+                        continue
+                    found.append((d2, len(found), obj))
+
+            reach = r * cs # всё непросмотренное не ближе этого
+            if seen >= total:
+                break
+            if max_radius is not None and reach > max_radius:
+                break
+            if len(found) >= k and heapq.nsmallest(k, found)[-1][0] <= reach * reach:
+                break
+            r += 1
+
+        return [obj for d2, i, obj in heapq.nsmallest(k, found)]
@@ -0,0 +1,146 @@
+import numpy as np
+from classes.vector import Vector2
+
+class Vec2Array(object):
+    """
+        Array of 2D vectors stored as one float64 [n, 2] NumPy array.
+        Operators work like Vector2 ones but on the whole array at once;
+        the other operand can be a scalar, a Vector2, another Vec2Array
+        or anything NumPy can broadcast to [n, 2].
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data=None, n=0):
+        if data is None:
+            self.data = np.zeros((n, 2), np.float64)
+        elif isinstance(data, Vec2Array):
+            self.data = data.data.copy()
+        elif isinstance(data, np.ndarray):
+            self.data = data.astype(np.float64).reshape(-1, 2)
+        else:
+            self.data = np.array([tuple(v) for v in data], np.float64).reshape(-1, 2)
+
+    @staticmethod
+    def operand(other):
+        if isinstance(other, Vec2Array):
+            return other.data
+        if isinstance(other, Vector2):
+            return (other.x, other.y)
+        return other
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            x, y = self.data[i]
+            return Vector2(float(x), float(y))
+        return Vec2Array(self.data[i])
+
+    def __setitem__(self, i, value):
+        self.data[i] = self.operand(value)
+
+    def __iter__(self):
+        for x, y in self.data.tolist():
+            yield Vector2(x, y)
+
+    def __repr__(self):
+        return "Vec2Array(" + repr(self.data.tolist()) + ")"
+
+    def __neg__(self):
+        return Vec2Array(-self.data)
+
+    def __abs__(self):
+        return Vec2Array(np.abs(self.data))
+
+    def __add__(self, other):
+        return Vec2Array(self.data + self.operand(other))
+
+    def __sub__(self, other):
+        return Vec2Array(self.data - self.operand(other))
+
+    def __mul__(self, other):
+        return Vec2Array(self.data * self.operand(other))
+
+    def __truediv__(self, other):
+        return Vec2Array(self.data / self.operand(other))
+
+    def __floor__(self):
+        return Vec2Array(np.floor(self.data))
+
+    def iadd(self, other):
+        self.data += self.operand(other)
+        return self
+
+    def isub(self, other):
+        self.data -= self.operand(other)
+        return self
+
+    def imul(self, other):
+        self.data *= self.operand(other)
+        return self
+
+    def idiv(self, other):
+        self.data /= self.operand(other)
+        return self
+
+    @property
+    def lengths(self):
+        return np.hypot(self.data[:, 0], self.data[:, 1])
+
+    @property
+    def normalized(self):
+        lengths = self.lengths
+        lengths[lengths == 0] = 1
+        return Vec2Array(self.data / lengths[:, np.newaxis])
+
+    def normalize(self):
+        lengths = self.lengths
+        lengths[lengths == 0] = 1
+        self.data /= lengths[:, np.newaxis]
+
+    def dot(self, other):
+        other = self.operand(other)
+        if isinstance(other, np.ndarray):
+            return np.einsum("ij,ij->i", self.data, other)
+        return self.data[:, 0] * other[0] + self.data[:, 1] * other[1]
+
+    def distance(self, other):
+        d = self.data - self.operand(other)
+        return np.hypot(d[:, 0], d[:, 1])
+
+    def rotated(self, angle):
+        c, s = np.cos(angle), np.sin(angle)
+        x, y = self.data[:, 0], self.data[:, 1]
+        return Vec2Array(np.stack((x * c - y * s, x * s + y * c), axis=1))
+
+    def lerp(self, other, t):
+        a = self.data
+        return Vec2Array(a + (self.operand(other) - a) * t)
+
+    def clamp(self, other):
+        other = np.abs(np.asarray(self.operand(other), np.float64))
+        np.clip(self.data, -other, other, out=self.data)
+
+    def copy(self):
+        return Vec2Array(self.data.copy())
+
+    @property
+    def list_noRound(self):
+        return self.data.tolist()
+
+    @property
+    def list(self):
+        # Как Vector2.list: банковское округление round()
+        return np.rint(self.data).astype(np.int64).tolist()
+
+    def to_vectors(self):
+        return [Vector2(x, y) for x, y in self.data.tolist()]
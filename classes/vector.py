@@ -1,133 +1,178 @@
-from math import *
-from types import *
+from math import sqrt, floor
 
 class Vector2(object):
-
-    def __init__(self, *args, **kwargs):
-        self.__x, self.__y = 0, 0
-        if len(args)>0:
-            if isinstance(args[0], (tuple, list)):
-                self.__x, self.__y = args[0]
-            if len(args)==2:
-                self.__x, self.__y = args
-            if isinstance(args[0], Vector2):
-                self.__x, self.__y = args[0].x, args[0].y
-            if len(args)==1 and isinstance(args[0], (float, int)):
-                self.__x, self.__y = args[0], args[0]
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0, y=None):
+        if y is not None:
+            self.x, self.y = x, y
+        elif isinstance(x, (float, int)):
+            self.x, self.y = x, x
+        elif isinstance(x, Vector2):
+            self.x, self.y = x.x, x.y
+        else:
+            self.x, self.y = x
 
     def setX(self, x):
-        self.__x = x
+        self.x = x
 
     def setY(self, y):
-        self.__y = y
-
-    x = property(lambda self: self.__x, setX)
-    y = property(lambda self: self.__y, setY)
+        self.y = y
 
     def __eq__(self, other):
-        return self.__x == other.x and self.__y == other.y
+        return self.x == other.x and self.y == other.y
 
     @property
     def length(self):
-        return sqrt(self.__x**2+self.__y**2)
+        return sqrt(self.x*self.x+self.y*self.y)
 
     def __len__(self):
-        return sqrt(self.__x**2+self.__y**2)
+        return sqrt(self.x*self.x+self.y*self.y)
 
     @property
     def normalized(self):
-        len = sqrt(self.__x**2+self.__y**2)
+        len = sqrt(self.x*self.x+self.y*self.y)
         if len == 0:
             return Vector2(0, 0)
-        return Vector2(self.__x, self.__y) / len
+        return Vector2(self.x / len, self.y / len)
 
     def normalize(self):
-        len = sqrt(self.__x**2+self.__y**2)
+        len = sqrt(self.x*self.x+self.y*self.y)
         if len == 0:
             return
-        self.__x /= len
-        self.__y /= len
+        self.x /= len
+        self.y /= len
 
     def __round__(self, n=0):
-        return Vector2(round(self.__x, n), round(self.__y, n))
+        return Vector2(round(self.x, n), round(self.y, n))
 
     def __neg__(self):
-        return Vector2(-self.__x, -self.__y)
+        return Vector2(-self.x, -self.y)
 
     def __abs__(self):
-        return Vector2(abs(self.__x), abs(self.__y))
+        return Vector2(abs(self.x), abs(self.y))
 
     def __add__(self, other):
-        if isinstance(other, float) or isinstance(other, int):
-            return Vector2(self.__x+other, self.__y+other)
+        if other.__class__ is Vector2:
+            return Vector2(self.x+other.x, self.y+other.y)
+        elif isinstance(other, (float, int)):
+            return Vector2(self.x+other, self.y+other)
         elif isinstance(other, Vector2):
-            return Vector2(self.__x+other.x, self.__y+other.y)
+            return Vector2(self.x+other.x, self.y+other.y)
 
     def __repr__(self):
-        return str(self.__x)+", "+str(self.__y)
+        return str(self.x)+", "+str(self.y)
 
     def __str__(self):
-        return str(round(self.__x, 2))+", "+str(round(self.__y, 2))
+        return str(round(self.x, 2))+", "+str(round(self.y, 2))
 
     def __mod__(self, other):
         if isinstance(other, Vector2):
-            return Vector2(self.__x % other.__x, self.__y % other.__y)
+            return Vector2(self.x % other.x, self.y % other.y)
         else:
-            return Vector2(self.__x % other, self.__y % other)
+            return Vector2(self.x % other, self.y % other)
 
     def __sub__(self, other):
-        if isinstance(other, float) or isinstance(other, int):
-            return Vector2(self.__x-other, self.__y-other)
+        if other.__class__ is Vector2:
+            return Vector2(self.x-other.x, self.y-other.y)
+        elif isinstance(other, (float, int)):
+            return Vector2(self.x-other, self.y-other)
         elif isinstance(other, Vector2):
-            return Vector2(self.__x-other.x, self.__y-other.y)
+            return Vector2(self.x-other.x, self.y-other.y)
 
     def __mul__(self, other):
-        if isinstance(other, float) or isinstance(other, int):
-            return Vector2(self.__x*other, self.__y*other)
-        elif isinstance(other, Vector2):
-            return Vector2(self.__x*other.x, self.__y*other.y)
-
-    def __div__(self, other):
-        if isinstance(other, float) or isinstance(other, int):
-            return Vector2(self.__x/other, self.__y/other)
+        if other.__class__ is Vector2:
+            return Vector2(self.x*other.x, self.y*other.y)
+        elif isinstance(other, (float, int)):
+            return Vector2(self.x*other, self.y*other)
         elif isinstance(other, Vector2):
-            return Vector2(self.__x/other.x, self.__y/other.y)
+            return Vector2(self.x*other.x, self.y*other.y)
 
     def __truediv__(self, other):
-        if isinstance(other, float) or isinstance(other, int):
-            return Vector2(self.__x/other, self.__y/other)
+        if other.__class__ is Vector2:
+            return Vector2(self.x/other.x, self.y/other.y)
+        elif isinstance(other, (float, int)):
+            return Vector2(self.x/other, self.y/other)
         elif isinstance(other, Vector2):
-            return Vector2(self.__x/other.x, self.__y/other.y)
+            return Vector2(self.x/other.x, self.y/other.y)
+
+    __div__ = __truediv__
+
+    # Операции на месте: меняют сам вектор и возвращают его.
+    # Обычные +=, *= по-прежнему создают новый вектор, так что
+    # старый код, который делит один Vector2 между объектами, не ломается.
+
+    def iadd(self, other):
+        if isinstance(other, Vector2):
+            self.x += other.x
+            self.y += other.y
+        else:
+            self.x += other
+            self.y += other
+        return self
+
+    def isub(self, other):
+        if isinstance(other, Vector2):
+            self.x -= other.x
+            self.y -= other.y
+        else:
+            self.x -= other
+            self.y -= other
+        return self
+
+    def imul(self, other):
+        if isinstance(other, Vector2):
+            self.x *= other.x
+            self.y *= other.y
+        else:
+            self.x *= other
+            self.y *= other
+        return self
+
+    def idiv(self, other):
+        if isinstance(other, Vector2):
+            self.x /= other.x
+            self.y /= other.y
+        else:
+            self.x /= other
+            self.y /= other
+        return self
+
+    def set(self, x, y):
+        self.x, self.y = x, y
+        return self
 
     def __iter__(self):
-        return [self.__x, self.__y]
+        return iter((self.x, self.y))
 
     def __getitem__(self, i):
-        return [self.__x, self.__y][i]
+        return (self.x, self.y)[i]
 
     def __floor__(self):
-        return Vector2(floor(self.__x), floor(self.__y))
+        return Vector2(floor(self.x), floor(self.y))
 
     def dot(self, other):
-        return self.__x*other.x+self.__y*other.y
+        return self.x*other.x+self.y*other.y
 
     def distance(self, other):
-        return Vector2(self.__x-other.x, self.__y-other.y).length
+        dx = self.x-other.x
+        dy = self.y-other.y
+        return sqrt(dx*dx+dy*dy)
 
     def copy(self):
-        return Vector2(self.__x, self.__y)
+        return Vector2(self.x, self.y)
 
     def copyFrom(self, other):
-        self.__x, self.__y = other.__x, other.__y
+        self.x, self.y = other.x, other.y
 
     def clamp(self, other):
         clmp = lambda v,mi,ma: min(max(v, mi), ma)
-        self.__x, self.__y = clmp(self.__x, -other.__x, other.__x), clmp(self.__y, -other.__y, other.__y)
+        self.x, self.y = clmp(self.x, -other.x, other.x), clmp(self.y, -other.y, other.y)
 
     @property
     def list_noRound(self):
-        return [self.__x, self.__y]
+        return [self.x, self.y]
 
     @property
     def list(self):
-        return [round(self.__x), round(self.__y)]
+        return [round(self.x), round(self.y)]
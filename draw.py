@@ -1,9 +1,71 @@
 import pygame
+from collections import OrderedDict
 
 def default_falloff(x):
     return 1 - x**1.5
 
-def light(radius, colorf, colorb=(0, 0, 0), steps=50, falloff=default_falloff):
+def linear_falloff(x):
+    return 1 - x
+
+class TextureCache():
+    """
+        LRU cache of generated textures limited by memory (max_bytes).
+        Cached surfaces are shared between callers and must not be drawn on;
+        copy() them first if needed.
+    """
+
+    def __init__(self, max_bytes=16*1024*1024):
+        self.max_bytes = max_bytes
+        self.textures = OrderedDict() # key -> surface, от старых к новым
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def size_of(self, surf):
+        return surf.get_bytesize() * surf.get_width() * surf.get_height()
+
+    def get(self, key, make):
+        surf = self.textures.get(key)
+        if surf is not None:
+            self.textures.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = make()
+        self.textures[key] = surf
+        self.bytes += self.size_of(surf)
+        self.trim()
+        return surf
+
+    def trim(self):
+        # Последняя добавленная текстура остаётся, даже если одна не влезает
+        while self.bytes > self.max_bytes and len(self.textures) > 1:
+            key, surf = self.textures.popitem(last=False)
+            self.bytes -= self.size_of(surf)
+            self.evictions += 1
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.trim()
+
+    def clear(self):
+        self.textures = OrderedDict()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "textures": len(self.textures),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+light_cache = TextureCache()
+
+def render_light(radius, colorf, colorb=(0, 0, 0), steps=50, falloff=default_falloff):
     radius = round(radius)
     surf = pygame.Surface((radius*2, radius*2))
     surf.fill(colorb)
@@ -15,3 +77,10 @@ def light(radius, colorf, colorb=(0, 0, 0), steps=50, falloff=default_falloff):
             color[ci] = round(colorf[ci]*imul + colorb[ci]*(1-imul))
         pygame.draw.circle(surf, color, (radius, radius), round(radius*0.7 + (radius*0.3-2)*mul))
     return surf
+
+def light(radius, colorf, colorb=(0, 0, 0), steps=50, falloff=default_falloff):
+    # Текстура берётся из light_cache и общая для всех, рисовать на ней нельзя.
+    # falloff сравнивается по самой функции, поэтому лямбда, созданная
+    # на месте, каждый раз будет промахом - лучше передавать функции модуля
+    key = (round(radius), tuple(colorf), tuple(colorb), steps, falloff)
+    return light_cache.get(key, lambda: render_light(radius, colorf, colorb, steps, falloff))
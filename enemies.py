@@ -48,20 +48,20 @@ class RandomAI(AI):
 
         if name == "x":
             if self.ent.grounded:
-                ground = map.block_at(
+                ground = map.solid_at(
                     self.ent.pos + self.ent.size * Vector2(self.move, 1.1)
                 )
-                wall = map.block_at(
+                wall = map.solid_at(
                     self.ent.pos + self.ent.size * Vector2(self.move*1.1, 0)
                 )
-                if not map.tilesolid.get(ground, False) or map.tilesolid.get(wall, False):
+                if not ground or wall:
                     self.move = -self.move
             return self.move
 
     def update(self, dt):
-        ticks = pygame.time.get_ticks()
-        if self.next_think < ticks:
-            self.next_think = ticks + 500 + 500 * random.random()
+        time = self.game.time
+        if self.next_think < time:
+            self.next_think = time + 0.5 + 0.5 * random.random()
             move = random.randint(0, 1)
             self.move = (move*2-1) if random.random()>0.2 else 0
             self.jumping = random.random()>0.8
@@ -1,10 +1,13 @@
 import pygame
 from classes.vector import Vector2
 from classes.aabb import AABB
+from classes.spatialgrid import SpatialGrid
 import pymunk
 import math
 import draw
+import shadows
 import random
+from operator import attrgetter
 from util import get_path, get_all_subclasses
 
 def value(id, name, args, kwargs, default=None):
@@ -15,12 +18,34 @@ def value(id, name, args, kwargs, default=None):
     else:
         return default
 
+class Handle():
+    """
+        Reference to an entity that survives its removal: an id plus the
+        generation of that id. EntList.resolve returns None once the
+        entity is removed, even if the id was given to another entity.
+    """
+    __slots__ = ("id", "generation")
+
+    def __init__(self, id, generation):
+        self.id = id
+        self.generation = generation
+
+    def __eq__(self, other):
+        return isinstance(other, Handle) and self.id == other.id and self.generation == other.generation
+
+    def __hash__(self):
+        return hash((self.id, self.generation))
+
+    def __repr__(self):
+        return "Handle(" + str(self.id) + ", " + str(self.generation) + ")"
+
 class Entity():
 
     def __init__(self, *args, **kwargs):
         self.game = None
         self.entlist = None
         self.id = None
+        self.handle = None
 
     def __register__(self, game, entlist, id):
         self.game = game
@@ -47,6 +72,11 @@ class Entity():
     def draw(self, surface):
         pass
 
+    def get_bounds(self):
+        # (x0, y0, x1, y1) в пикселях мира для EntList.grid,
+        # None - сущность нигде не находится
+        return None
+
 class PhysEntity(Entity):
 
     def __init__(self, *args, **kwargs):
@@ -59,6 +89,9 @@ class PhysEntity(Entity):
 
         self.body = None
         self.shape = None
+        self.transform = None # слот в game.physics.transforms
+        self.dormant = False # тело вынуто из space, update не вызывается
+        self.sleep_velocity = None
 
     def spawned(self):
         self.gravity = 60 * 8
@@ -69,7 +102,6 @@ class PhysEntity(Entity):
         self.body = pymunk.Body(self.mass, pymunk.inf)
 
         self.pos = self.spawn_pos * 8
-        self.prev_pos = self.pos
 
         def grav(body, gravity, damping, dt):
             pymunk.Body.update_velocity(body, (0, self.gravity * self.game.physics_scale), damping, dt)
@@ -83,23 +115,61 @@ class PhysEntity(Entity):
             self.bevel * self.game.physics_scale
         )
         self.game.space.add(self.body, self.shape)
+        self.transform = self.game.physics.add(self.body)
 
     def remove(self):
-        self.game.space.remove(self.body, self.shape)
+        if self._must_remove:
+            return
+        if self.dormant:
+            # Тело уже вынуто из space в sleep()
+            self.sleep_velocity = None
+        else:
+            self.game.space.remove(self.body, self.shape)
+            self.game.physics.remove(self.transform)
+            self.transform = None
         super().remove()
 
+    def sleep(self):
+        # Позиция остаётся в самом body, скорость сохраняется отдельно
+        if self.dormant:
+            return
+        self.sleep_velocity = self.body.velocity
+        self.game.space.remove(self.body, self.shape)
+        self.game.physics.remove(self.transform)
+        self.transform = None
+        self.dormant = True
+
+    def wake(self):
+        if not self.dormant:
+            return
+        # Сначала физика чанков под сущностью, чтобы она не провалилась
+        gstate = self.game.game_state()
+        if getattr(gstate, "map", None):
+            manager = gstate.map.chunk_manager
+            half = self.size / 2
+            for chunk in manager.chunks_around(AABB(self.pos - half, self.pos + half), 0):
+                manager.ensure_physics(chunk, True)
+        self.game.space.add(self.body, self.shape)
+        self.body.velocity = self.sleep_velocity
+        self.sleep_velocity = None
+        self.transform = self.game.physics.add(self.body)
+        self.normals = []
+        self.dormant = False
+
     def arbiter(self, a):
         n = -a.contact_point_set.normal
         self.normals.append(Vector2(n.x, n.y))
         if n.y < -0.7:
-            self.grounded_timer = pygame.time.get_ticks()
+            self.grounded_timer = self.game.time
 
     @property
     def grounded(self):
-        return self.grounded_timer+100>pygame.time.get_ticks()
+        return self.grounded_timer+0.1>self.game.time
 
     def setPos(self, pos):
         self.body.position = (pos * self.game.physics_scale).list
+        if self.transform is not None:
+            self.game.physics.transforms.teleport(self.transform)
     pos = property(lambda self: Vector2(
         self.body.position.x / self.game.physics_scale,
         self.body.position.y / self.game.physics_scale
@@ -112,6 +182,21 @@ class PhysEntity(Entity):
         self.body.velocity.y / self.game.physics_scale
     ), setVel)
 
+    def render_pos(self):
+        # Позиция между двумя последними шагами физики
+        if self.transform is None:
+            return self.pos
+        x, y = self.game.physics.render_pos(self.transform)
+        scale = self.game.physics_scale
+        return Vector2(x / scale, y / scale)
+
+    def get_bounds(self):
+        scale = self.game.physics_scale
+        x, y = self.body.position
+        x, y = x / scale, y / scale
+        w, h = self.size.x / 2, self.size.y / 2
+        return (x - w, y - h, x + w, y + h)
+
     def jump(self):
         jump_v = math.sqrt(2.0 * self.jumpheight * self.game.physics_scale * self.gravity * self.game.physics_scale)
         impulse = (0, -self.body.mass * jump_v)
@@ -157,13 +242,11 @@ class Pawn(PhysEntity):
         pass
 
     def draw(self, surface):
-        blend = self.game.phys_blend
-        pos = self.game.camera.to_screen(self.pos*blend + self.prev_pos*(1-blend))
-        self.draw_sprite(surface, pos)
-        self.prev_pos = self.pos
+        self.draw_sprite(surface, self.game.camera.to_screen(self.render_pos()))
 
 
 class Enemy(Pawn):
+    sleepable = True # засыпает вдали от камеры и игрока, см. EntList.update_activity
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -246,6 +329,13 @@ class Light(Entity):
         self.on = True
         self.project = True
         self.surface = None
+        self.surface_scale = 1
+        self.scaled_texture = None
+        self.scaled_key = None
+        # Сегменты теней чанков segment_chunks одним массивом
+        self.shadow_segments = None
+        self.segment_chunks = None
+        self.segment_versions = None
 
     @staticmethod
     def from_surface(surf):
@@ -258,6 +348,13 @@ class Light(Entity):
         offset = Vector2(self.radius)
         return AABB(self.pos-offset, self.pos+offset)
 
+    def get_bounds(self):
+        # darkness затемняет всё вокруг себя и не отсекается никогда
+        if self.darkness:
+            return None
+        r = self.radius
+        return (self.pos.x - r, self.pos.y - r, self.pos.x + r, self.pos.y + r)
+
     def wall_intersects(self, point1, point2):
         if point1.distance(self.pos)<self.radius or point2.distance(self.pos)<self.radius:
             return True
@@ -271,75 +368,72 @@ class Light(Entity):
         det = b * b - 4 * a * c
         return det>0
 
-    def project_light(self):
-        self.surface = self.texture.copy()
-        light_aabb = self.get_aabb()
+    def occluder_chunks(self):
         gstate = self.game.game_state()
         if hasattr(gstate, "map") and gstate.map:
-            chunks = gstate.map.test_aabb_chunks(light_aabb)
-            size = Vector2(self.radius)
-            p_offset = -self.pos + size
-            count = 0
-            for chunk in chunks:
-                for seg in chunk.segments:
-                    if not self.wall_intersects(seg[0], seg[1]):
-                        continue
-
-                    dir = (seg[0] + seg[1]) / 2 - self.pos
-                    if ((-dir) if self.darkness else dir).dot(seg[2])>0:
-                        continue
-
-                    left = Vector2(seg[2].y, -seg[2].x)
-
-                    p1 = seg[0] + p_offset
-                    p2 = seg[1] + p_offset
-                    c = (p1 + p2) / 2
-
-                    d1 = p1 - size
-                    d1.normalize()
-                    d2 = p2 - size
-                    d2.normalize()
-
-                    dot = d1.dot(d2)
-
-                    points = []
-                    if dot>0:
-                        points = [
-                            (p1).list,
-                            (p1 + d1 * self.radius * 2).list,
-                            (p2 + d2 * self.radius * 2).list,
-                            (p2).list
-                        ]
-                    else:
-                        d = d1+d2
-                        d.normalize()
-                        points = [
-                            (p1).list,
-                            (p1 + d1 * self.radius * 2).list,
-                            (c + d * self.radius * 2).list,
-                            (p2 + d2 * self.radius * 2).list,
-                            (p2).list
-                        ]
-                    count += 1
-                    pygame.draw.polygon(self.surface, self.colorbg, points)
-                    #pygame.draw.line(surf, (0,255,0), p1.list, p2.list)
-
-
-    def draw_tex(self, surface):
+            return gstate.map.test_aabb_chunks(self.get_aabb())
+        return []
+
+    def get_texture(self, scale=1):
+        # Текстура для карты освещения в scale раз меньше экрана
+        if scale == 1:
+            return self.texture
+        if self.scaled_key != (self.texture, scale):
+            w, h = self.texture.get_size()
+            self.scaled_texture = pygame.transform.smoothscale(
+                self.texture, (max(round(w / scale), 1), max(round(h / scale), 1))
+            )
+            self.scaled_key = (self.texture, scale)
+        return self.scaled_texture
+
+    def project_light(self, chunks=None, scale=1):
+        # Поверхность не пересоздаётся, в неё просто заново копируется текстура
+        texture = self.get_texture(scale)
+        if self.surface is None or self.surface.get_size() != texture.get_size():
+            self.surface = texture.copy()
+        else:
+            self.surface.blit(texture, (0, 0))
+        self.surface_scale = scale
+        if chunks is None:
+            chunks = self.occluder_chunks()
+        versions = [chunk.physics_version for chunk in chunks]
+        if chunks != self.segment_chunks or versions != self.segment_versions:
+            self.shadow_segments = shadows.concat([chunk.get_occluder_array() for chunk in chunks])
+            self.segment_chunks = chunks
+            self.segment_versions = versions
+
+        quads, pentagons = shadows.shadow_polygons(
+            self.shadow_segments, self.pos.x, self.pos.y, self.radius, self.darkness, scale
+        )
+        polygon = pygame.draw.polygon
+        for points in quads:
+            polygon(self.surface, self.colorbg, points)
+        for points in pentagons:
+            polygon(self.surface, self.colorbg, points)
+
+    def draw_tex(self, surface, scale=1):
+        # scale - во сколько раз surface меньше экрана
         if not self.on:
             return
 
-        if self.renderpos.distance(self.pos)>1:
-            if self.project:
-                self.project_light()
-            else:
-                self.surface = self.texture.copy()
-            self.renderpos = self.pos.copy()
-        if self.surface:
-            pos = self.game.camera.to_screen(self.pos)
-            blend = pygame.BLEND_RGB_MULT if self.darkness else pygame.BLEND_RGB_ADD
-            size = Vector2(self.radius)
-            surface.blit(self.surface, (pos - size).list, special_flags=blend)
+        if not self.project:
+            # Текстура общая (draw.light_cache), на ней ничего не рисуется
+            light_surface = self.get_texture(scale)
+        else:
+            # Тени пересчитываются, только если свет сдвинулся больше чем на пиксель
+            # или у чанков вокруг поменялась физика
+            chunks = self.occluder_chunks()
+            versions = [chunk.physics_version for chunk in chunks]
+            if (self.surface is None or self.renderpos.distance(self.pos)>1 or self.surface_scale != scale or
+                chunks != self.segment_chunks or versions != self.segment_versions):
+                self.project_light(chunks, scale)
+                self.renderpos = self.pos.copy()
+            light_surface = self.surface
+
+        pos = self.game.camera.to_screen(self.pos) / scale
+        size = Vector2(self.radius) / scale
+        blend = pygame.BLEND_RGB_MULT if self.darkness else pygame.BLEND_RGB_ADD
+        surface.blit(light_surface, (pos - size).list, special_flags=blend)
         """
         pygame.draw.rect(surface, (255, 0, 255), pygame.Rect(
             (pos - size).list,
@@ -373,36 +467,115 @@ class Light(Entity):
 
 class EntList():
 
-    def __init__(self, game, game_state):
+    def __init__(self, game, game_state, cell_size=64):
         self.game = game
         self.game_state = game_state
-        self._entities = {}
+        self._entities = {} # id -> ent
         self._classes = {}
+        self._types = {} # класс и все его предки -> {id: ent}
+        self._capabilities = {} # имя атрибута -> {id: ent}, заводятся в query_with
 
         self._add = []
+        self._pending = {} # id -> ent, ещё не добавленные через push
         self._iterating = False
 
-        self.chunk_tree = {} # "0x0 , 0x13"
-        self.chunk_tree_size = Vector2(128)
+        # Свободные id: сначала освобождённые, потом _next_id и дальше
+        self._free = []
+        self._next_id = 0
+        self._generations = {} # id -> сколько раз id освобождался
+
+        # Сетка по get_bounds() сущностей, обновляется после их update
+        self.grid = SpatialGrid(cell_size)
+        self._unbounded = {} # id -> ent, get_bounds() -> None, в сетке их нет
+        self._order = 0 # номер следующей добавленной сущности, см. visible
+
+        # Запас вокруг вида при отсечении: спрайты больше физических границ
+        self.cull_margin = 16
+        # Запас клеток в query_sectors: сдвиг сущностей с последнего update_grid
+        self.sector_margin = 16
+        self.drawn = 0
+        self.culled = 0
+
+        # Сущности со sleepable засыпают дальше sleep_radius от всех центров
+        # активности и просыпаются ближе wake_radius (пиксели мира)
+        self.wake_radius = 256
+        self.sleep_radius = 320
+        self._awake = {} # id -> ent, sleepable и не спят
+        self._dormant = {} # id -> ent
 
     def get(self, id):
-        return self._entities.get(str(id), None)
+        if isinstance(id, Handle):
+            return self.resolve(id)
+        if id.__class__ is not int:
+            id = int(id)
+        return self._entities.get(id, None)
+
+    def resolve(self, handle):
+        if handle is None or self._generations.get(handle.id, 0) != handle.generation:
+            return None
+        ent = self._entities.get(handle.id)
+        if ent is None:
+            ent = self._pending.get(handle.id)
+        return ent
+
+    def used(self, id):
+        return id in self._entities or id in self._pending
 
     def get_valid_id(self):
-        id = 0
-        while not (self.get(id) is None):
-            id += 1
+        while self._free:
+            id = self._free.pop()
+            if not self.used(id):
+                return id
+        while self.used(self._next_id):
+            self._next_id += 1
+        id = self._next_id
+        self._next_id += 1
         return id
 
-    def add(self, ent, id=None):
+    def free_id(self, id):
+        self._generations[id] = self._generations.get(id, 0) + 1
+        # id дальше _next_id и так достанутся по порядку
+        if id < self._next_id:
+            self._free.append(id)
+
+    def reserve(self, ent, id):
         if id is None:
             id = self.get_valid_id()
-        self._entities[str(id)] = ent
+        ent.id = id
+        ent.handle = Handle(id, self._generations.get(id, 0))
+        return id
+
+    def add(self, ent, id=None):
+        if id is None or self._pending.get(id) is not ent:
+            id = self.reserve(ent, id)
+        self._pending.pop(id, None)
+        if id in self._entities:
+            # Явный id занят - старая сущность вытесняется, как и раньше
+            self.remove(id)
+            ent.handle = Handle(id, self._generations.get(id, 0))
+        self._entities[id] = ent
+        ent._order = self._order
+        self._order += 1
         ent.__register__(self.game, self, id)
         classname = ent.__class__.__name__
         if self._classes.get(classname, None) is None:
             self._classes[classname] = {}
-        self._classes[classname][str(id)] = ent
+        self._classes[classname][id] = ent
+        for cls in ent.__class__.__mro__:
+            if cls is object:
+                continue
+            if self._types.get(cls, None) is None:
+                self._types[cls] = {}
+            self._types[cls][id] = ent
+        for name, ents in self._capabilities.items():
+            if hasattr(ent, name):
+                ents[id] = ent
+        if getattr(ent, "sleepable", False):
+            if ent.dormant:
+                self._dormant[id] = ent
+            else:
+                self._awake[id] = ent
+        self.place(id, ent)
         return ent
 
     def add_cleanup(self):
@@ -414,79 +587,223 @@ class EntList():
         if not self._iterating:
             self.add(ent, id)
         else:
+            # id и handle выдаются сразу, сама сущность добавится после цикла
+            id = self.reserve(ent, id)
+            self._pending[id] = ent
             self._add.append([ent, id])
         return ent
 
     def remove(self, id):
-        ent = self.get(str(id))
-        classname = ent.__class__.__name__
-        classes = self._classes[classname]
-        if ent:
-            del self._entities[str(id)]
-            del classes[str(id)]
-            del ent
+        if isinstance(id, Handle):
+            if self.resolve(id) is None:
+                return
+            id = id.id
+        elif id.__class__ is not int:
+            id = int(id)
+        ent = self._entities.get(id)
+        if ent is not None:
+            self.grid.remove(ent)
+            self._unbounded.pop(id, None)
+            del self._entities[id]
+            del self._classes[ent.__class__.__name__][id]
+            for cls in ent.__class__.__mro__:
+                if cls is not object:
+                    del self._types[cls][id]
+            for ents in self._capabilities.values():
+                ents.pop(id, None)
+            self._awake.pop(id, None)
+            self._dormant.pop(id, None)
+        else:
+            # Ещё не добавлена через push
+            ent = self._pending.pop(id, None)
+            if ent is None:
+                return
+            self._add = [pair for pair in self._add if pair[0] is not ent]
+        self.free_id(id)
 
     def get_by_class(self, classname):
         return self._classes.get(classname, {}).values()
 
+    def query(self, cls):
+        # Все сущности класса cls и его наследников
+        return self._types.get(cls, {}).values()
+
+    def query_with(self, name):
+        # Все сущности с атрибутом name (например "health").
+        # Индекс строится при первом запросе и дальше ведётся в add/remove
+        ents = self._capabilities.get(name, None)
+        if ents is None:
+            ents = {id: ent for id, ent in self._entities.items() if hasattr(ent, name)}
+            self._capabilities[name] = ents
+        return ents.values()
+
     def get_all(self):
         return self._entities.values()
 
     def remove_all(self):
+        for id in list(self._entities) + list(self._pending):
+            self._generations[id] = self._generations.get(id, 0) + 1
         del self._entities
         self._entities = {}
+        self._classes = {}
+        self._types = {}
+        self._capabilities = {}
+        self._add = []
+        self._pending = {}
+        self._free = []
+        self._next_id = 0
+        self._awake = {}
+        self._dormant = {}
+        self.grid.clear()
+        self._unbounded = {}
 
     def event(self, ev):
         self._iterating = True
         [ent.event(ev) for ent in self._entities.values()]
         self._iterating = False
 
-    def chunk_tree_add(self, ent):
-        if not hasattr(ent, "pos") and self.pos:
-            return
+    def set_cell_size(self, cell_size):
+        self.grid.set_cell_size(cell_size)
 
-        if not hasattr(ent, "size") or ent.size is None:
-            chunk_pos = math.floor(ent.pos / self.chunk_tree_size)
-            id = str(chunk_pos.x)+"x"+str(chunk_pos.y)
-            lst = self.chunk_tree.get(id, [])
-            lst.append(ent)
-            self.chunk_tree[id] = lst
+    def place(self, id, ent):
+        bounds = ent.get_bounds()
+        self.grid.update(ent, bounds)
+        if bounds is None:
+            self._unbounded[id] = ent
+        else:
+            self._unbounded.pop(id, None)
+
+    def update_grid(self):
+        # Спящие не двигаются, их границы в сетке и так верные
+        grid = self.grid
+        unbounded = self._unbounded
+        dormant = self._dormant
+        for id, ent in self._entities.items():
+            if id not in dormant:
+                bounds = ent.get_bounds()
+                grid.update(ent, bounds)
+                if bounds is None:
+                    unbounded[id] = ent
+                elif unbounded:
+                    unbounded.pop(id, None)
+
+    def get_active(self):
+        # Все, кроме спящих, в порядке добавления
+        if not self._dormant:
+            return self._entities.values()
+        dormant = self._dormant
+        return [ent for id, ent in self._entities.items() if id not in dormant]
+
+    def update_activity(self, centers):
+        # centers - точки (Vector2), вокруг которых мир живёт: камера, игрок.
+        # Решение зависит только от позиций и порядка в сетке, поэтому
+        # при том же ходе игры сущности засыпают и просыпаются так же
+        grid = self.grid
+        near = set()
+        for c in centers:
+            near.update(grid.query_radius(c.x, c.y, self.sleep_radius))
+        for id, ent in list(self._awake.items()):
+            if ent not in near and not ent._must_remove:
+                ent.sleep()
+                del self._awake[id]
+                self._dormant[id] = ent
+
+        for c in centers:
+            for ent in grid.query_radius(c.x, c.y, self.wake_radius):
+                if ent.id in self._dormant:
+                    ent.wake()
+                    del self._dormant[ent.id]
+                    self._awake[ent.id] = ent
+
+    def query_aabb(self, aabb, cls=None):
+        return self.grid.query_aabb(aabb.min.x, aabb.min.y, aabb.max.x, aabb.max.y, cls)
+
+    def query_radius(self, pos, radius, cls=None):
+        return self.grid.query_radius(pos.x, pos.y, radius, cls)
+
+    def nearest(self, pos, k=1, max_radius=None, cls=None):
+        return self.grid.nearest(pos.x, pos.y, k, max_radius, cls)
+
+    def sector(self, origin, dir, half_angle, radius, exclude=None):
+        # half_angle в градусах, как и углы в остальном коде
+        length = dir.length
+        if length == 0:
+            dx, dy = 0, 0
         else:
-            chunk_pos_min = math.floor((ent.pos - ent.size / 2) / self.chunk_tree_size)
-            chunk_pos_max = math.floor((ent.pos + ent.size / 2) / self.chunk_tree_size)
-            for y in range(chunk_pos_min.y, chunk_pos_max.y+1):
-                for x in range(chunk_pos_min.x, chunk_pos_max.x+1):
-                    id = str(x)+"x"+str(y)
-                    lst = self.chunk_tree.get(id, [])
-                    lst.append(ent)
-                    self.chunk_tree[id] = lst
+            dx, dy = dir.x / length, dir.y / length
+        cos_half = math.cos(math.radians(half_angle))
+        return (origin.x, origin.y, dx, dy, cos_half, radius, exclude)
+
+    def query_sector(self, origin, dir, half_angle, radius, cls=None, exclude=None):
+        return self.query_sectors([(origin, dir, half_angle, radius, exclude)], cls)[0]
+
+    def query_sectors(self, sectors, cls=None):
+        # sectors - [(origin, dir, half_angle, radius[, exclude])],
+        # возвращает список сущностей для каждого сектора.
+        # Сетка обновляется после update, поэтому проверяются текущие
+        # границы сущностей, а клетки берутся с запасом sector_margin
+        return self.grid.query_sectors(
+            [self.sector(*sector) for sector in sectors], cls,
+            lambda ent: ent.get_bounds(), self.sector_margin
+        )
 
-    def chunk_tree_get(self, aabb):
-        ents = set()
-        chunk_min = math.floor((aabb.min) / self.chunk_tree_size)
-        chunk_max = math.floor((aabb.max) / self.chunk_tree_size)
-        for y in range(chunk_min.y, chunk_max.y+1):
-            for x in range(chunk_min.x, chunk_max.x+1):
-                id = str(x)+"x"+str(y)
-                ents = ents.union(set(self.chunk_tree.get(id, [])))
+    def visible(self, view, cls=None, margin=0):
+        # Сущности, границы которых пересекают view (AABB), в порядке добавления.
+        # Сущности без границ (get_bounds() -> None) видны всегда.
+        # Обходятся только попадания сетки, а не все сущности
+        ents = self.grid.query_aabb(
+            view.min.x - margin, view.min.y - margin,
+            view.max.x + margin, view.max.y + margin,
+            cls
+        )
+        if cls is None:
+            ents += self._unbounded.values()
+        else:
+            ents += [ent for ent in self._unbounded.values() if isinstance(ent, cls)]
+        ents.sort(key=attrgetter("_order"))
         return ents
 
+    def chunk_tree_get(self, aabb):
+        # Старое имя, см. query_aabb
+        return self.query_aabb(aabb)
+
     def update(self, dt):
         self._iterating = True
         remove_ids = []
-        self.chunk_tree = {}
-        for ent in self._entities.values():
-            self.chunk_tree_add(ent)
+        dormant = self._dormant
+        for id, ent in self._entities.items():
+            if id in dormant:
+                # Спящих не обновляем, но убранных во сне всё равно удаляем
+                if ent._must_remove:
+                    remove_ids.append(id)
+                continue
             ent.update(dt)
             if ent._must_remove:
                 remove_ids.append(ent.id)
 
         for id in remove_ids:
             self.remove(id)
+        # Позиции берутся уже после того, как все сущности сдвинулись
+        self.update_grid()
         self._iterating = False
         self.add_cleanup()
 
-    def draw(self, surface):
+    def draw(self, surface, view=None):
+        # view - видимая часть мира (Camera.get_view()), без него рисуется всё
         self._iterating = True
-        [ent.draw(surface) for ent in self._entities.values()]
+        if view is None:
+            ents = self._entities.values()
+        else:
+            ents = self.visible(view, None, self.cull_margin)
+        [ent.draw(surface) for ent in ents]
+        self.drawn = len(ents)
+        self.culled = len(self._entities) - self.drawn
         self._iterating = False
+
+    def stats(self):
+        return {
+            "entities": len(self._entities),
+            "dormant": len(self._dormant),
+            "drawn": self.drawn,
+            "culled": self.culled
+        }
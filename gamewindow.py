@@ -11,6 +11,8 @@ from classes.vector import Vector2
 from settings import Settings
 from input import Input
 from camera import Camera
+from profiler import Profiler
+from physics import PhysicsScheduler
 
 import math
 from screeninfo import get_monitors
@@ -23,11 +25,11 @@ class GameWindow():
 
     def __init__(self):
         self.real_size = Vector2(320, 180)
-        self.monitors = get_monitors()
-        self.screen_size = Vector2(self.monitors[0].width, self.monitors[0].height)
+        self.screen_size = self.get_screen_size()
 
         self.settings = Settings()
         self.init_settings()
+        self.profiler = Profiler()
 
         self.sounds = SoundSystem()
         pygame.init()
@@ -43,6 +45,10 @@ class GameWindow():
         self.time = 0
         self.delta = 0
 
+    def get_screen_size(self):
+        self.monitors = get_monitors()
+        return Vector2(self.monitors[0].width, self.monitors[0].height)
+
     def init_settings(self):
         pixel_scales = []
         max_px = math.ceil(self.screen_size.x / self.real_size.x)
@@ -51,6 +57,12 @@ class GameWindow():
         self.settings.add_select("pixel_scale", max_px-1, pixel_scales, False)
         self.settings.add_boolean("fullscreen", False)
         self.settings.add_slider("framerate", 144, 30, 288)
+        self.settings.add_slider("chunk_memory", 32, 4, 256) # МБ на поверхности чанков
+        self.settings.add_slider("chunk_workers", 2, 0, 8) # 0 - запекать чанки в главном потоке
+        self.settings.add_select("lighting_quality", 1, [1, 2, 4], False) # во сколько раз карта освещения меньше экрана
+        self.settings.add_select("physics_rate", 128, [64, 128, 256], False) # шагов физики в секунду
+        self.settings.add_slider("physics_max_steps", 8, 1, 32) # больше шагов за кадр не делается
+        self.settings.add_slider("world_seed", 0, 0, 9999) # 0 - каждый раз новый мир, без кэша; иначе мир из WorldCache
 
         self.settings.add_keybind("move_up", K_w)
         self.settings.add_keybind("move_left", K_a)
@@ -60,9 +72,12 @@ class GameWindow():
         self.settings.add_keybind("move_jump", K_SPACE)
         self.settings.add_keybind("pickup", K_e)
 
+        self.settings.add_keybind("profiler", K_F3)
+        self.settings.add_keybind("profiler_export", K_F4)
+
     def init_window(self):
         fullscreen = self.settings.fullscreen.get()
-        px_scale = math.floor(self.monitors[0].width / self.real_size.x) if fullscreen else self.settings.pixel_scale.get()
+        px_scale = math.floor(self.screen_size.x / self.real_size.x) if fullscreen else self.settings.pixel_scale.get()
         flags = DOUBLEBUF | HWSURFACE
         if fullscreen:
             flags = flags | FULLSCREEN
@@ -99,8 +114,11 @@ class GameWindow():
         self.physics_scale = 2
         self.space = pymunk.Space()
         self.space.gravity = 0, 20 * 8 * self.physics_scale
-        self.accumulator = 0
-        self.phys_time = 0
+        self.physics = PhysicsScheduler(
+            self,
+            self.settings.physics_rate.get(),
+            self.settings.physics_max_steps.get()
+        )
 
     def to_real(self, v):
         return v * self.real_size / self.window_size
@@ -117,16 +135,27 @@ class GameWindow():
             self.loop()
 
     def loop(self):
-        self.delta = self.clock.get_time()
-        self.delta /= 1000
-        self.delta = min(self.delta, 1/10)
+        delta = self.clock.get_time()
+        delta /= 1000
+        self.step(min(delta, 1/10))
+
+        fps = self.settings.framerate.get()
+        self.clock.tick(fps) # Лимит FPS
+
+    def step(self, dt, render=True):
+        # Один кадр игры с заданным dt, без ожидания (см. headless.py)
+        self.delta = dt
+        profiler = self.profiler
+        profiler.frame_begin()
 
         # Event'ы
+        t = profiler.begin()
         for ev in pygame.event.get():
             event = self.input.process_event(ev)
             if self.pre_event(event):
                 self.game_state().event(event)
             self.event(event)
+        profiler.end("events", t)
         # - - - - - - - -
 
         # Update'ы
@@ -135,11 +164,17 @@ class GameWindow():
         self.update(self.delta)
         # - - - - - - - -
 
-        # Отрисовка
+        if render:
+            self.render()
+        profiler.frame_end()
+
+    def render(self):
+        profiler = self.profiler
         self.surface.fill((255, 0, 255)) # Заполняем экран ярким цветом
         if self.pre_draw(self.surface):
             self.game_state().draw(self.surface)
         self.draw(self.surface)
+        t = profiler.begin()
         if self.current_state == "default":
             surf = pygame.Surface((self.real_size / self.camera.get_zoom()).list)
             surf.blit(self.surface, (0, 0), pygame.Rect(
@@ -149,12 +184,15 @@ class GameWindow():
             self.screen.blit(pygame.transform.scale(surf, self.window_size.list), (0, 0))
         else:
             self.screen.blit(pygame.transform.scale(self.surface, self.window_size.list), (0, 0))
+        profiler.end("scale", t)
+
+        t = profiler.begin()
         self.draw_debug(self.screen)
-        pygame.display.flip() # Обновляет экран
-        # - - - - - - - -
+        profiler.end("overlay", t)
 
-        fps = self.settings.framerate.get()
-        self.clock.tick(fps) # Лимит FPS
+        t = profiler.begin()
+        pygame.display.flip() # Обновляет экран
+        profiler.end("flip", t)
 
     def game_state(self, name=None):
         if name is None:
@@ -203,21 +241,19 @@ class GameWindow():
     def event(self, ev):
         if ev.type == pygame.QUIT:
             self.running = False
+        if ev.type == pygame.KEYDOWN:
+            if ev.key == "profiler":
+                self.profiler.toggle_overlay()
+            elif ev.key == "profiler_export":
+                self.profiler.export("profile.csv")
 
     def pre_update(self, dt):
-
-        self.phys_blend = 0
         if self.current_state == "default":
             self.time += dt
 
-            fixed_dt = 1/128
-            self.accumulator += dt
-            while self.accumulator >= fixed_dt:
-                self.space.step(fixed_dt)
-                self.phys_time += fixed_dt
-                self.accumulator -= fixed_dt
-
-            self.phys_blend = self.accumulator / fixed_dt
+            self.physics.set_rate(self.settings.physics_rate.get())
+            self.physics.max_steps = self.settings.physics_max_steps.get()
+            self.physics.update(dt)
 
             self.camera.update(dt)
         return True
@@ -236,3 +272,5 @@ class GameWindow():
         #self.space.debug_draw(self.pymunk_debug_screen)
         text = "FPS: " + str(round(self.clock.get_fps(), 1))
         surface.blit(self.debug_font.render(text, True, (255, 255, 255)), (0, 0))
+        if self.profiler.overlay:
+            self.profiler.draw(surface, self.debug_font)
@@ -0,0 +1,204 @@
+import os
+# До pygame.init(): окно и звук не нужны
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import sys
+import json
+import time
+import hashlib
+import random
+import argparse
+
+import pygame
+from pygame.locals import *
+
+from gamewindow import GameWindow
+from input import Input
+from classes.vector import Vector2
+
+class ScriptedInput(Input):
+    """
+        Input without a keyboard or mouse: held keys, mouse position and
+        buttons are set by a Script every tick.
+    """
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.keys = set() # имена биндов
+        self.pos = game.real_size / 2
+        self.buttons = (False, False, False)
+
+    def mouse_pos(self):
+        return self.pos.copy()
+
+    def mouse_pressed(self, b=None):
+        if b is None:
+            return self.buttons
+        return self.buttons[b]
+
+    def mouse_rel(self):
+        return Vector2()
+
+    def key_pressed(self, key):
+        return key in self.keys
+
+
+class Script():
+    """
+        Scripted input, a list of entries:
+            {"tick": 0, "until": 120, "keys": ["move_right"]}
+            {"tick": 30, "press": "move_jump"}
+            {"tick": 60, "until": 90, "mouse": [250, 90], "buttons": [1, 0, 0]}
+        "until" is exclusive, without it the entry lasts one tick.
+        Mouse position is in real_size pixels.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = []
+        for entry in entries or []:
+            self.add(entry)
+
+    @staticmethod
+    def load(path):
+        with open(path) as f:
+            return Script(json.load(f))
+
+    def add(self, entry):
+        entry = dict(entry)
+        if "press" in entry:
+            entry["keys"] = [entry.pop("press")]
+        entry.setdefault("until", entry["tick"] + 1)
+        self.entries.append(entry)
+
+    def hold(self, tick, until, *keys):
+        self.add({"tick": tick, "until": until, "keys": list(keys)})
+
+    def press(self, tick, key):
+        self.add({"tick": tick, "press": key})
+
+    def mouse(self, tick, until, pos, buttons=(False, False, False)):
+        self.add({"tick": tick, "until": until, "mouse": list(pos), "buttons": list(buttons)})
+
+    def apply(self, game, tick):
+        input = game.input
+        keys = set()
+        buttons = [False, False, False]
+        for entry in self.entries:
+            if not entry["tick"] <= tick < entry["until"]:
+                continue
+            keys.update(entry.get("keys", ()))
+            if "mouse" in entry:
+                input.pos = Vector2(entry["mouse"])
+            for i, b in enumerate(entry.get("buttons", ())):
+                buttons[i] = buttons[i] or bool(b)
+
+        # Нажатия и отпускания идут обычными event'ами, как с клавиатуры
+        binds = game.settings.binds
+        for key in sorted(keys - input.keys):
+            pygame.event.post(pygame.event.Event(KEYDOWN, key=binds[key].get(), mod=0, unicode="", scancode=0))
+        for key in sorted(input.keys - keys):
+            pygame.event.post(pygame.event.Event(KEYUP, key=binds[key].get(), mod=0, unicode="", scancode=0))
+        input.keys = keys
+        input.buttons = tuple(buttons)
+
+
+class HeadlessWindow(GameWindow):
+    """
+        GameWindow on SDL dummy drivers without monitors or frame limiting.
+        The world is generated from a fixed seed and advanced by a fixed dt,
+        chunks are baked in the main thread so every run is the same,
+        whether the world came from WorldCache or was generated.
+        cache=False generates the world even if it is cached.
+    """
+
+    def __init__(self, seed=0, screen_size=(1920, 1080), cache=True):
+        self.headless_screen = Vector2(screen_size)
+        random.seed(seed)
+        super().__init__()
+        self.settings.chunk_workers.value = 0
+        self.seed = seed
+        self.tick = 0
+        if not cache:
+            self.states["default"].world_cache = None
+
+    def get_screen_size(self):
+        self.monitors = []
+        return self.headless_screen.copy()
+
+    def init_input(self):
+        self.input = ScriptedInput(self)
+
+    def start(self, state="default"):
+        # Сразу в игру, без меню и переходов
+        self.states[state].world_seed = self.seed
+        self.changing_from = self.current_state
+        self.changing_to = state
+        self.game_state(state).pre_activate(self.current_state)
+        self.confirm_change_state()
+        # Общий random (ИИ врагов) с одного и того же места после создания мира
+        random.seed(self.seed)
+
+    def run_ticks(self, ticks, dt=1/60, render=False, script=None):
+        for i in range(ticks):
+            if script:
+                script.apply(self, self.tick)
+            self.step(dt, render)
+            self.tick += 1
+
+
+def state_hash(game):
+    # Отпечаток сущностей: класс, id и позиция
+    ents = []
+    for ent in game.game_state().entities.get_all():
+        pos = ent.pos.list if hasattr(ent, "pos") else None
+        ents.append((ent.__class__.__name__, ent.id, pos))
+    return hashlib.md5(repr(ents).encode()).hexdigest()
+
+def run(ticks=600, dt=1/60, seed=0, render=False, script=None, cache=True):
+    game = HeadlessWindow(seed, cache=cache)
+    game.start()
+    start = time.perf_counter()
+    game.run_ticks(ticks, dt, render, script)
+    elapsed = time.perf_counter() - start
+    return game, {
+        "ticks": ticks,
+        "dt": dt,
+        "seed": seed,
+        "render": render,
+        "seconds": elapsed,
+        "ticks_per_second": ticks / elapsed if elapsed else 0,
+        "game_time": game.time,
+        "state": state_hash(game)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the game without a window")
+    parser.add_argument("ticks", type=int, nargs="?", default=600)
+    parser.add_argument("--dt", type=float, default=1/60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--render", action="store_true", help="draw every tick as well")
+    parser.add_argument("--script", help="JSON file with scripted input, see Script")
+    parser.add_argument("--no-cache", action="store_true", help="generate the world even if it is cached")
+    parser.add_argument("--check", action="store_true",
+                        help="also run with a freshly generated world and exit with 1 if the states differ")
+    args = parser.parse_args()
+
+    script = Script.load(args.script) if args.script else None
+    game, result = run(args.ticks, args.dt, args.seed, args.render, script, not args.no_cache)
+    if args.check:
+        # Первый прогон уже положил мир в кэш: ещё раз из кэша и ещё раз
+        # с генерацией, состояние в конце должно совпасть у всех трёх
+        warm = run(args.ticks, args.dt, args.seed, args.render, script, True)[1]
+        cold = run(args.ticks, args.dt, args.seed, args.render, script, False)[1]
+        result["warm_state"] = warm["state"]
+        result["cold_state"] = cold["state"]
+        result["deterministic"] = result["state"] == warm["state"] == cold["state"]
+    player = game.game_state().player
+    if player:
+        result["player_pos"] = player.pos.list
+    json.dump(result, sys.stdout, indent=4)
+    print()
+    if args.check and not result["deterministic"]:
+        sys.exit(1)
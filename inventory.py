@@ -23,7 +23,7 @@ class Item(Entity):
     def spawned(self):
         self.icon = pygame.image.load(get_path("resources/sprites/items/"+self.name+"/icon.png")).convert()
         self.icon.set_colorkey((0, 0, 0))
-        self.background = draw.light(10, self.color, (0, 0, 0), 3, lambda x: (1-x))
+        self.background = draw.light(10, self.color, (0, 0, 0), 3, draw.linear_falloff)
 
     def load_image(self, name):
         return pygame.image.load(get_path("resources/sprites/items/"+self.name+"/"+name))
@@ -43,6 +43,13 @@ class Item(Entity):
     def draw_held(self, surface, player):
         pass
 
+    def get_bounds(self):
+        # В инвентаре предмет рисуется вокруг игрока и не отсекается
+        if self.inv:
+            return None
+        r = self.background.get_width() / 2 if self.background else 0
+        return (self.pos.x - r, self.pos.y - r, self.pos.x + r, self.pos.y + r)
+
     def draw(self, surface):
         if self.inv:
             self.pos = self.inv.player.pos
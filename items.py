@@ -30,8 +30,10 @@ class Item_ColdShard(Item):
         return value
 
     def delete_lights(self):
-        for light in self.lights:
-            light.remove()
+        for handle in self.lights:
+            light = self.entlist.resolve(handle)
+            if light:
+                light.remove()
         self.lights = []
 
     def update(self, dt):
@@ -39,22 +41,21 @@ class Item_ColdShard(Item):
         if self.last_count != self.count:
             self.delete_lights()
 
-            def tmpfalloff(x):
-                return 1-x
-
             for i in range(self.count):
                 light = self.entlist.push(Light.from_surface(draw.light(
                     24 / (1 + ( self.count - 1 ) / 12),
                     (60, 80, 90),
                     (0, 0, 0),
                     5,
-                    tmpfalloff
+                    draw.linear_falloff
                 )))
                 light.project = False
-                self.lights.append(light)
+                self.lights.append(light.handle)
 
-        for light in self.lights:
-            light.on = not (self.inv is None)
+        for handle in self.lights:
+            light = self.entlist.resolve(handle)
+            if light:
+                light.on = not (self.inv is None)
 
         self.last_count = self.count
 
@@ -71,8 +72,9 @@ class Item_ColdShard(Item):
         for i in range(self.count):
             pos = self.get_shard_pos(player, i)
             if len(self.lights)>i:
-                light = self.lights[i]
-                light.pos = pos
+                light = self.entlist.resolve(self.lights[i])
+                if light:
+                    light.pos = pos
             surface.blit(
                 shard,
                 (self.game.camera.to_screen(pos) - Vector2(shard.get_size())/2).list,
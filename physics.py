@@ -0,0 +1,145 @@
+import numpy as np
+
+class TransformStore():
+    """
+        Positions of physics bodies before and after the last space step,
+        one row per body in two [capacity, 2] arrays (physics coordinates).
+        Rendering interpolates between them with the scheduler's alpha.
+    """
+
+    def __init__(self, capacity=64):
+        self.prev = np.zeros((capacity, 2), np.float64)
+        self.cur = np.zeros((capacity, 2), np.float64)
+        self.bodies = [None] * capacity # slot -> pymunk.Body
+        self.free = list(range(capacity - 1, -1, -1))
+
+        # Занятые слоты и их тела подряд, для snapshot
+        self.live = None
+        self.live_bodies = None
+
+        self.version = 0 # меняется вместе с prev/cur
+        self.render = None
+        self.render_key = None
+
+    def grow(self):
+        capacity = len(self.bodies)
+        self.prev = np.concatenate((self.prev, np.zeros((capacity, 2), np.float64)))
+        self.cur = np.concatenate((self.cur, np.zeros((capacity, 2), np.float64)))
+        self.bodies += [None] * capacity
+        self.free = list(range(capacity * 2 - 1, capacity - 1, -1)) + self.free
+
+    def add(self, body):
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.bodies[slot] = body
+        self.live = None
+        self.teleport(slot)
+        return slot
+
+    def remove(self, slot):
+        if slot is None or self.bodies[slot] is None:
+            return
+        self.bodies[slot] = None
+        self.free.append(slot)
+        self.live = None
+
+    def clear(self):
+        for slot, body in enumerate(self.bodies):
+            if body is not None:
+                self.remove(slot)
+
+    def teleport(self, slot):
+        # Тело переставили вручную - без интерполяции со старого места
+        self.prev[slot] = self.cur[slot] = self.bodies[slot].position
+        self.version += 1
+
+    def step(self):
+        # После space.step: старое cur становится prev, cur читается из тел
+        if self.live is None:
+            self.live = np.array([i for i, body in enumerate(self.bodies) if body is not None], np.int64)
+            self.live_bodies = [self.bodies[i] for i in self.live]
+        self.prev, self.cur = self.cur, self.prev
+        if len(self.live):
+            self.cur[self.live] = [body.position for body in self.live_bodies]
+        self.version += 1
+
+    def interpolated(self, alpha):
+        # Все позиции разом, пересчитываются только при новом шаге или alpha
+        key = (self.version, alpha)
+        if self.render_key != key:
+            self.render = self.prev + (self.cur - self.prev) * alpha
+            self.render_key = key
+        return self.render
+
+
+class PhysicsScheduler():
+    """
+        Fixed-step driver for game.space. Runs at most max_steps steps per
+        frame; time that did not fit is dropped instead of being carried
+        into the next frame, so a hitch cannot snowball.
+    """
+
+    def __init__(self, game, rate=128, max_steps=8):
+        self.game = game
+        self.rate = rate
+        self.fixed_dt = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0
+        self.time = 0
+        self.alpha = 0
+        self.steps = 0 # за последний кадр
+        self.dropped = 0 # всего выброшено шагов
+        self.transforms = TransformStore()
+
+    def set_rate(self, rate):
+        if rate == self.rate:
+            return
+        # Доля накопленного шага сохраняется
+        self.accumulator = self.accumulator * self.rate / rate
+        self.rate = rate
+        self.fixed_dt = 1 / rate
+
+    def update(self, dt):
+        profiler = self.game.profiler
+        space = self.game.space
+        transforms = self.transforms
+        fixed_dt = self.fixed_dt
+
+        self.accumulator += dt
+        self.steps = 0
+        while self.accumulator >= fixed_dt and self.steps < self.max_steps:
+            t = profiler.begin()
+            space.step(fixed_dt)
+            transforms.step()
+            profiler.end("physics", t)
+            profiler.count_step()
+            self.time += fixed_dt
+            self.accumulator -= fixed_dt
+            self.steps += 1
+
+        if self.accumulator >= fixed_dt:
+            skipped = int(self.accumulator / fixed_dt)
+            self.dropped += skipped
+            self.accumulator -= skipped * fixed_dt
+
+        self.alpha = self.accumulator / fixed_dt
+        return self.steps
+
+    def add(self, body):
+        return self.transforms.add(body)
+
+    def remove(self, slot):
+        self.transforms.remove(slot)
+
+    def render_pos(self, slot):
+        # Интерполированная позиция тела в физических координатах
+        return self.transforms.interpolated(self.alpha)[slot]
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "steps": self.steps,
+            "dropped": self.dropped,
+            "bodies": len(self.transforms.bodies) - len(self.transforms.free)
+        }
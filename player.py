@@ -9,7 +9,7 @@ from util import get_path, get_all_subclasses
 
 from entlist import value, Pawn, Light
 
-from inventory import Inventory
+from inventory import Inventory, Item
 import items
 
 class Player(Pawn):
@@ -57,8 +57,8 @@ class Player(Pawn):
         # LIGHT
 
         brightness = 0.35
-        self.light = Light(50, (255*brightness, 245*brightness, 230*brightness))
-        self.entlist.push(self.light, 1000)
+        light = Light(50, (255*brightness, 245*brightness, 230*brightness))
+        self.light = self.entlist.push(light, 1000).handle
 
 
 
@@ -69,7 +69,9 @@ class Player(Pawn):
     def die(self, dmgdata={}):
         super().die(dmgdata)
         self.remove()
-        self.light.remove()
+        light = self.entlist.resolve(self.light)
+        if light:
+            light.remove()
 
     def jump(self):
         super().jump()
@@ -77,43 +79,26 @@ class Player(Pawn):
 
     def attack(self, dir):
         self.attack_vfx_timer = self.game.time + self.attack_vfx_duration
-        for ent in self.entlist.get_all():
-            if ent.id == self.id:
-                continue
-            if not hasattr(ent, "health"):
-                continue
-
+        for ent in self.entlist.query_sector(self.pos, dir, 30, 40, Pawn, exclude=self):
             entdir = ent.pos - self.pos
             dist = entdir.length
-            entdir.normalize()
-            ang = math.degrees(math.atan2(-entdir.y, entdir.x))
-            hitang = math.degrees(math.atan2(-dir.y, dir.x))
-            phi = abs(ang-hitang) % 360
-            phi = (360 - phi) if (phi > 180) else phi
+            # Отбор по углу уже сделан в query_sector без тригонометрии,
+            # угол считается только для попавших - дальность падает к краю до половины
+            phi = math.degrees(math.acos(min(max(entdir.dot(dir) / dist, -1), 1))) if dist else 0
             maxl = 1 - (phi/30) * 0.5
 
-            if phi < 30 and dist < maxl * 40:
+            if dist < maxl * 40:
                 ent.take_damage({
                     "damage": self.attack_damage,
                     "force": dir * Vector2(self.attack_force, self.attack_force * 0.5) + Vector2(0, -self.attack_force * 0.75 - ent.vel.y * 0.75),
                     "attacker": self
                 })
 
-        chunks_bake = set()
-
+        cells = []
         for t in range(0, 30, 5):
-            block_pos = math.floor((self.pos + dir * t) / 8)
-            map = self.entlist.game_state.map
-
-            chunks_bake = chunks_bake.union(map.remove_tile(block_pos + Vector2(0, 0)))
-            chunks_bake = chunks_bake.union(map.remove_tile(block_pos + Vector2(-1, 0)))
-            chunks_bake = chunks_bake.union(map.remove_tile(block_pos + Vector2(1, 0)))
-            chunks_bake = chunks_bake.union(map.remove_tile(block_pos + Vector2(0, -1)))
-            chunks_bake = chunks_bake.union(map.remove_tile(block_pos + Vector2(0, 1)))
-
-        for chunk in chunks_bake:
-            chunk.bake()
-            chunk.bake_physics()
+            x, y = math.floor((self.pos + dir * t) / 8).list
+            cells += [(x, y), (x-1, y), (x+1, y), (x, y-1), (x, y+1)]
+        self.entlist.game_state.map.carve_cells(cells)
 
     def draw_attack(self, surface, pos):
         attack_vfx_frame = (self.attack_vfx_timer - self.game.time) / self.attack_vfx_duration
@@ -140,24 +125,16 @@ class Player(Pawn):
             })
 
     def pickup_item(self):
-        items = self.entlist.chunk_tree_get(AABB(
-            self.pos - Vector2(20),
-            self.pos + Vector2(20),
-        ))
-
         min_dist = 10
         pickup_item = None
-        for item in items:
-            if not hasattr(item, "inv"):
-                continue
-
+        for item in self.entlist.query_radius(self.pos, min_dist, Item):
             if not (item.inv is None):
                 continue
 
             dist = item.pos.distance(self.pos)
             if dist < min_dist:
                 pickup_item = item
-                dist = min_dist
+                min_dist = dist
 
         if pickup_item:
             self.inventory.add(pickup_item)
@@ -228,7 +205,9 @@ class Player(Pawn):
 
         self.vel = Vector2(new_vx, new_vy)
 
-        self.light.pos = self.pos.copy()
+        light = self.entlist.resolve(self.light)
+        if light:
+            light.pos = self.pos.copy()
 
 
         # ATTACKING
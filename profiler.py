@@ -0,0 +1,163 @@
+import csv
+import json
+from time import perf_counter
+from collections import deque
+
+import pygame
+
+class Profiler():
+    """
+        Per-phase frame timings kept in a ring buffer of the last
+        `capacity` frames. Phases are timed only while enabled: otherwise
+        there is no current frame and begin()/end() return right away.
+    """
+
+    PHASES = (
+        "events", "physics", "entities", "map_update",
+        "map_draw", "entities_draw", "lighting", "scale", "overlay", "flip"
+    )
+    COLORS = {
+        "events": (200, 200, 200),
+        "physics": (80, 160, 255),
+        "entities": (80, 220, 120),
+        "map_update": (230, 200, 60),
+        "map_draw": (240, 140, 40),
+        "entities_draw": (220, 80, 200),
+        "lighting": (255, 240, 160),
+        "scale": (140, 100, 255),
+        "overlay": (90, 90, 90),
+        "flip": (255, 80, 80),
+        "other": (50, 50, 50)
+    }
+
+    def __init__(self, capacity=600):
+        self.enabled = False
+        self.overlay = False
+        self.samples = deque(maxlen=capacity) # {"frame", "total", фазы..., "physics_steps"}
+        self.frame = None # фаза -> секунды, только пока кадр записывается
+        self.frame_start = 0
+        self.frame_index = 0
+        self.physics_steps = 0
+
+        self.stats_cache = None
+        self.stats_index = -1
+
+        self.graph = None
+        self.graph_index = -1 # последний кадр на графике
+        self.text = []
+        self.text_stats = None
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.enabled = self.overlay
+
+    def begin(self):
+        if self.frame is None:
+            return 0
+        return perf_counter()
+
+    def end(self, name, start):
+        if self.frame is None:
+            return
+        self.frame[name] = self.frame.get(name, 0) + perf_counter() - start
+
+    def count_step(self):
+        if self.frame is not None:
+            self.physics_steps += 1
+
+    def frame_begin(self):
+        if not self.enabled:
+            self.frame = None
+            return
+        self.frame = {}
+        self.physics_steps = 0
+        self.frame_start = perf_counter()
+
+    def frame_end(self):
+        if self.frame is None:
+            return
+        sample = {"frame": self.frame_index, "total": perf_counter() - self.frame_start}
+        for name in self.PHASES:
+            sample[name] = self.frame.get(name, 0)
+        sample["physics_steps"] = self.physics_steps
+        self.samples.append(sample)
+        self.frame_index += 1
+        self.frame = None
+
+    def clear(self):
+        self.samples.clear()
+        self.stats_cache = None
+
+    def percentiles(self, name, ps=(50, 95, 99)):
+        values = sorted(sample[name] for sample in self.samples)
+        if not values:
+            return [0 for p in ps]
+        # Ближайший ранг
+        return [values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))] for p in ps]
+
+    def stats(self):
+        # {фаза: (p50, p95, p99)} в секундах, пересчитывается раз в 30 кадров
+        if self.stats_cache is None or self.frame_index - self.stats_index >= 30:
+            self.stats_cache = {name: self.percentiles(name) for name in ("total",) + self.PHASES}
+            self.stats_index = self.frame_index
+        return self.stats_cache
+
+    def export(self, path):
+        # .csv - таблица, иначе JSON Lines: одна строка на кадр
+        fields = ["frame", "total"] + list(self.PHASES) + ["physics_steps"]
+        with open(path, "w", newline="") as f:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(f, fields)
+                writer.writeheader()
+                writer.writerows(self.samples)
+            else:
+                for sample in self.samples:
+                    f.write(json.dumps(sample) + "\n")
+        return len(self.samples)
+
+    def draw_bar(self, graph, sample, bar, ms):
+        # Новый столбик справа, старые сдвигаются влево
+        w, h = graph.get_size()
+        graph.scroll(-bar, 0)
+        x = w - bar
+        graph.fill((0, 0, 0), pygame.Rect(x, 0, bar, h))
+        for line in (1/60, 1/30):
+            graph.fill((70, 70, 70), pygame.Rect(x, h - round(line * ms), bar, 1))
+        y = h
+        rest = sample["total"]
+        for name in self.PHASES + ("other",):
+            t = rest if name == "other" else sample[name]
+            rest -= t
+            top = max(y - round(t * ms), 0)
+            if top < y:
+                graph.fill(self.COLORS[name], pygame.Rect(x, top, bar, y - top))
+            y = top
+
+    def draw(self, surface, font, pos=(8, 24), size=(360, 120), bar=2):
+        # График копится в своей поверхности, за кадр дорисовываются только
+        # новые столбики; текст перерисовывается вместе со stats()
+        if not self.samples:
+            return
+        if self.graph is None or self.graph.get_size() != size:
+            self.graph = pygame.Surface(size)
+            self.graph.fill((0, 0, 0))
+            self.graph_index = -1
+        ms = size[1] / 0.033 # 33 мс на всю высоту, линии на 60 и 30 FPS
+        for sample in self.samples:
+            if sample["frame"] > self.graph_index:
+                self.draw_bar(self.graph, sample, bar, ms)
+                self.graph_index = sample["frame"]
+        surface.blit(self.graph, pos)
+
+        stats = self.stats()
+        if self.text_stats is not stats:
+            lines = [("%-14s %6s %6s %6s" % ("ms", "p50", "p95", "p99"), (255, 255, 255))]
+            for name, values in stats.items():
+                text = "%-14s %6.2f %6.2f %6.2f" % ((name,) + tuple(v * 1000 for v in values))
+                lines.append((text, self.COLORS.get(name, (255, 255, 255))))
+            self.text = [font.render(text, True, color) for text, color in lines]
+            self.text_stats = stats
+        y = pos[1] + size[1] + 4
+        for text in self.text:
+            surface.blit(text, (pos[0], y))
+            y += font.get_linesize()
@@ -7,7 +7,7 @@ class Parameter():
         self.default = None
 
     def get(self):
-        if self.value:
+        if self.value is not None:
             return self.value
         return self.default
 
@@ -0,0 +1,99 @@
+import numpy as np
+
+# Тени от света сразу для всех сегментов на NumPy.
+#
+# Сегменты хранятся по столбцам - float64 массив [10, n] из
+# Chunk.get_occluder_array, строки:
+#   x0, y0, x1, y1, nx, ny, mx, my, dx, dy
+# Арифметика повторяет старый построчный вариант Light.project_light
+# в том же порядке операций, поэтому многоугольники получаются те же.
+
+ROWS = 10
+
+def occluder_array(occluders):
+    return np.ascontiguousarray(np.array(occluders, np.float64).reshape(-1, ROWS).T)
+
+def concat(arrays):
+    arrays = [a for a in arrays if a.shape[1]]
+    if not arrays:
+        return np.zeros((ROWS, 0), np.float64)
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.concatenate(arrays, 1)
+
+def visible(segments, px, py, radius, darkness=False):
+    # Маска сегментов, которые задевают круг света (как Light.wall_intersects)
+    # и повёрнуты к свету (от света для darkness)
+    x0, y0, x1, y1, nx, ny, mx, my, dx, dy = segments
+    cx, cy = round(px), round(py)
+    r2 = radius * radius
+
+    ex, ey = x0 - px, y0 - py
+    fx, fy = x1 - px, y1 - py
+    inside = (ex*ex + ey*ey < r2) | (fx*fx + fy*fy < r2)
+
+    qx, qy = x0 - cx, y0 - cy
+    a = dx * dx + dy * dy
+    b = 2 * (dx * qx + dy * qy)
+    c = qx * qx + qy * qy - r2
+    hit = inside | (b * b - 4 * a * c > 0)
+
+    facing = (mx - px) * nx + (my - py) * ny
+    if darkness:
+        return hit & (facing >= 0)
+    return hit & (facing <= 0)
+
+def normalize(x, y):
+    # На месте; нулевые векторы остаются нулевыми
+    l = np.sqrt(x*x + y*y)
+    l[l == 0] = 1
+    x /= l
+    y /= l
+
+def shadow_polygons(segments, px, py, radius, darkness=False, scale=1):
+    # Многоугольники теней в координатах текстуры света (центр в (radius, radius)),
+    # уменьшенной в scale раз. Возвращает (quads, pentagons): списки точек по 4 и по 5 штук
+    if segments.shape[1] == 0:
+        return [], []
+    segments = segments[:, visible(segments, px, py, radius, darkness)]
+    n = segments.shape[1]
+    if n == 0:
+        return [], []
+
+    ox, oy = -px + radius, -py + radius
+    p1x = segments[0] + ox
+    p1y = segments[1] + oy
+    p2x = segments[2] + ox
+    p2y = segments[3] + oy
+
+    d1x, d1y = p1x - radius, p1y - radius
+    d2x, d2y = p2x - radius, p2y - radius
+    normalize(d1x, d1y)
+    normalize(d2x, d2y)
+
+    # p1, p1 + d1*2r, середина (только для пятиугольников), p2 + d2*2r, p2
+    points = np.zeros((n, 5, 2), np.float64)
+    points[:, 0, 0] = p1x
+    points[:, 0, 1] = p1y
+    points[:, 1, 0] = p1x + d1x * radius * 2
+    points[:, 1, 1] = p1y + d1y * radius * 2
+    points[:, 3, 0] = p2x + d2x * radius * 2
+    points[:, 3, 1] = p2y + d2y * radius * 2
+    points[:, 4, 0] = p2x
+    points[:, 4, 1] = p2y
+
+    # Сегмент виден под углом больше 90 градусов - добавляется точка посередине
+    penta = d1x*d2x + d1y*d2y <= 0
+    if penta.any():
+        dmx = d1x[penta] + d2x[penta]
+        dmy = d1y[penta] + d2y[penta]
+        normalize(dmx, dmy)
+        points[penta, 2, 0] = (p1x[penta] + p2x[penta]) / 2 + dmx * radius * 2
+        points[penta, 2, 1] = (p1y[penta] + p2y[penta]) / 2 + dmy * radius * 2
+
+    if scale != 1:
+        points /= scale
+
+    # np.rint округляет до чётного, как round()
+    points = np.rint(points).astype(np.int64)
+    return points[~penta][:, (0, 1, 3, 4)].tolist(), points[penta].tolist()
@@ -10,6 +10,8 @@ from classes.vector import Vector2
 from classes.aabb import AABB
 
 from tilemap import Map
+from worldgen import generate_cave
+from worldcache import WorldCache
 from parallax import Parallax
 from entlist import EntList, Light
 
@@ -26,14 +28,29 @@ class DefaultState(FadeInOutState):
         self.fadeout_time = 0
         self.player = None
         self.map = None
+        self.entities = None
         self.vision = None
         self.parallax = None
 
+        self.world_seed = None # None - из настроек
+        self.world_cache = WorldCache()
+
     def init_world(self):
+        if self.entities is not None:
+            # Тела старого мира уходят из space и из game.physics
+            for ent in list(self.entities.get_all()):
+                ent.remove()
+            self.entities.remove_all()
+        self.game.physics.transforms.clear()
         self.entities = EntList(self.game, self)
 
-        self.map_generate()
+        seed = self.world_seed
+        if seed is None:
+            seed = self.game.settings.world_seed.get() or None
+        self.map_generate(seed=seed)
         self.spawn_player()
+        self.map.update(0)
+        self.map.chunk_manager.flush()
 
         self.vision = Light(100, (255, 255, 255), (30, 30, 30), True)
         self.vision.game = self.game
@@ -62,82 +79,33 @@ class DefaultState(FadeInOutState):
 
         self.slime = self.entities.push(enemies.IceSlime(Vector2(35, 35)))
 
-    def map_generate(self, size=(128, 256), fill=0.5, seed=None):
+    def map_generate(self, size=(128, 256), fill=0.5, seed=None, iterations=7, wall_thickness=(8, 8)):
+        if self.map is not None:
+            self.map.chunk_manager.shutdown()
         self.map = Map(self.game)
 
-        random.seed(seed)
-
-        wall_thickness = [8, 8]
-
-        gensize = (math.floor(size[0]/2)), size[1]
-
-        matr = []
-        for y in range(0, gensize[1]):
-            row = []
-            for x in range(0, gensize[0]):
-                value = random.random()<fill
-                if (x < wall_thickness[0]) or (x >= size[0]-wall_thickness[0]):
-                    value = True
-                if (y < wall_thickness[1]) or (y >= size[1]-wall_thickness[1]):
-                    value = True
-                row.append(value)
-            matr.append(row)
-
-        def count_surrounding(matr, x, y):
-            count = 0
-            for cy in range(y-1, y+2):
-                for cx in range(x-1, x+2):
-                    if cx==x and cy==y:
-                        continue
-                    if 0<=cx<gensize[0] and 0<=cy<gensize[1]:
-                        if matr[cy][cx]:
-                            count += 1
-                    else:
-                        count += 1
-            return count
-
-        for i in range(7):
-            new_matr = []
-            for y in range(0, gensize[1]):
-                row = []
-                for x in range(0, gensize[0]):
-                    value = matr[y][x]
-                    wall_count = count_surrounding(matr, x, y)
-                    if wall_count > 4:
-                        row.append(True)
-                    elif wall_count < 4:
-                        row.append(False)
-                    else:
-                        row.append(value)
-                new_matr.append(row)
-            matr = new_matr
-
-        def is_valid(matr, x, y):
-            size_x, size_y = len(matr[0]), len(matr)
-            if (0 <= x < size_x) and (0 <= y < size_y):
-                return True
-            return False
-
-        gigawall_thickness = [4, 4]
-        tiles = []
-        for y in range(0, size[1]):
-            row = []
-            for x in range(0, size[0]):
-                if x<gigawall_thickness[0] or x>(size[0]-gigawall_thickness[0]):
-                    row.append("metal")
-                elif y<gigawall_thickness[1] or y>(size[1]-gigawall_thickness[1]):
-                    row.append("metal")
-                elif matr[y][math.floor(x / 2)]:
-                    row.append("cave_wall")
-                else:
-                    row.append(None)
-            tiles.append(row)
-
-
-        self.map.load_from_matrix(tiles)
-        self.map.make_chunks()
-        self.map.bake_all()
-        self.map.bake_all_physics()
+        # Случайные миры (seed=None) не кэшируются
+        params = [size, fill, seed, iterations, wall_thickness]
+        cached = self.world_cache is not None and seed is not None
+
+        chunk_edges = None
+        if cached:
+            chunk_edges = self.world_cache.load(self.map, params)
+
+        if chunk_edges is None:
+            tiles = generate_cave(
+                size, fill, seed, iterations, wall_thickness,
+                wall_id=self.map.tile_ids["cave_wall"],
+                border_id=self.map.tile_ids["metal"]
+            )
+            self.map.load_from_matrix(tiles)
+            self.map.make_chunks()
+            if cached:
+                self.world_cache.save(self.map, params)
+        else:
+            self.map.set_pending_edges(chunk_edges)
+
+        # Чанки запекаются лениво, см. Map.chunk_manager
 
     def should_fade_in(self, state):
         return state != "pause"
@@ -146,19 +114,40 @@ class DefaultState(FadeInOutState):
         return False
 
     def init_lighting(self):
-        self.lighting = pygame.Surface(self.game.real_size.list)
+        # Буферы живут между кадрами и пересоздаются только при смене lighting_quality.
+        # При scale > 1 свет копится в lightmap меньшего размера, а потом
+        # один раз растягивается в lighting
+        self.lighting_scale = scale = self.game.settings.lighting_quality.get()
+        size = self.game.real_size
+        self.lightmap = None
+        if scale > 1:
+            # lighting может выйти чуть больше экрана, лишнее обрежется при blit
+            self.lightmap = pygame.Surface((ceil(size.x / scale), ceil(size.y / scale)))
+            size = Vector2(self.lightmap.get_size()) * scale
+        self.lighting = pygame.Surface(size.list)
+        self.lights_drawn = 0
+        self.lights_culled = 0
 
     def apply_lighting(self, surface):
-
-        self.lighting.fill((0, 0, 0))
-        for light in self.entities.get_by_class("Light"):
-            light.draw_tex(self.lighting)
-
-        surf = pygame.Surface(self.game.real_size.list)
-        surf.fill((10, 10, 10))
-        surf.blit(self.lighting, (0, 0), special_flags=BLEND_RGB_ADD)
-
-        surface.blit(surf, (0, 0), special_flags=BLEND_RGB_MULT)
+        if self.game.settings.lighting_quality.get() != self.lighting_scale:
+            self.init_lighting()
+        scale = self.lighting_scale
+        lightmap = self.lightmap if scale > 1 else self.lighting
+
+        lightmap.fill((0, 0, 0))
+        # Свет за экраном не проецируется и не рисуется. У darkness нет
+        # границ (Light.get_bounds), поэтому такой свет виден всегда
+        lights = self.entities.visible(self.game.camera.get_view(), Light, self.entities.cull_margin)
+        for light in lights:
+            light.draw_tex(lightmap, scale)
+        self.lights_drawn = len(lights)
+        self.lights_culled = len(self.entities.query(Light)) - self.lights_drawn
+        lightmap.fill((10, 10, 10), special_flags=BLEND_RGB_ADD)
+
+        if scale > 1:
+            pygame.transform.smoothscale(lightmap, self.lighting.get_size(), self.lighting)
+
+        surface.blit(self.lighting, (0, 0), special_flags=BLEND_RGB_MULT)
 
         #surface.blit(self.lighting, (0, 0), special_flags=BLEND_RGB_ADD)
 
@@ -187,8 +176,17 @@ class DefaultState(FadeInOutState):
         if self.player and self.player.alive:
             self.game.camera.pos = self.limit_camera(self.player.pos + aim * 0.25)
 
+        profiler = self.game.profiler
+        t = profiler.begin()
         self.entities.update(dt)
+        centers = [self.game.camera.get()]
+        if self.player and self.player.alive:
+            centers.append(self.player.pos)
+        self.entities.update_activity(centers)
+        profiler.end("entities", t)
+        t = profiler.begin()
         self.map.update(dt)
+        profiler.end("map_update", t)
 
         super().update(dt)
 
@@ -196,9 +194,16 @@ class DefaultState(FadeInOutState):
         self.surface = surface
         surface.fill((0, 0, 0))
         self.parallax.draw(surface)
+        profiler = self.game.profiler
+        t = profiler.begin()
         if self.map:
             self.map.draw(surface)
-        self.entities.draw(surface)
+        profiler.end("map_draw", t)
+        t = profiler.begin()
+        self.entities.draw(surface, self.game.camera.get_view())
+        profiler.end("entities_draw", t)
+        t = profiler.begin()
         self.apply_lighting(surface)
+        profiler.end("lighting", t)
 
         super().draw(surface)
@@ -0,0 +1,133 @@
+import pymunk
+
+class StaticGeometry():
+    """
+        Collision segments of the map merged across chunk borders.
+        Chunks report their edges per grid line; collinear faces with the
+        same normal that touch are joined into one run, and every run is a
+        single pymunk.Segment on the space's static body.
+        Changed lines are only marked dirty; flush() rebuilds them and
+        touches only the segments whose runs actually changed.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        # Ключ линии: (0, x, nx) - вертикальная, (1, y, ny) - горизонтальная,
+        # координаты в тайлах карты
+        self.lines = {} # ключ -> {chunk: [(a, b), ...]}
+        self.chunk_keys = {} # chunk -> ключи линий, где у него есть рёбра
+        self.runs = {} # ключ -> {(a, b): pymunk.Segment}
+        self.dirty = set()
+        self.shape_count = 0
+        self.rebuilt_lines = 0
+
+    def chunk_lines(self, chunk, edges):
+        ox = chunk.pos.x * chunk.size.x
+        oy = chunk.pos.y * chunk.size.y
+        lines = {}
+        for x0, y0, x1, y1, nx, ny in edges:
+            if nx:
+                lines.setdefault((0, x0 + ox, nx), []).append((y0 + oy, y1 + oy))
+            else:
+                lines.setdefault((1, y0 + oy, ny), []).append((x0 + ox, x1 + ox))
+        return lines
+
+    def set_lines(self, chunk, keys, lines):
+        # Рёбра чанка на линиях keys заменяются на lines
+        chunk_keys = self.chunk_keys.setdefault(chunk, set())
+        for key in keys:
+            intervals = lines.get(key)
+            line = self.lines.get(key)
+            if intervals:
+                if line is None:
+                    line = self.lines[key] = {}
+                line[chunk] = intervals
+                chunk_keys.add(key)
+            elif line is not None and chunk in line:
+                del line[chunk]
+                if not line:
+                    del self.lines[key]
+                chunk_keys.discard(key)
+            else:
+                continue
+            self.dirty.add(key)
+
+    def set_chunk(self, chunk, edges):
+        # Все рёбра чанка (после запекания физики)
+        lines = self.chunk_lines(chunk, edges)
+        self.set_lines(chunk, set(lines) | self.chunk_keys.get(chunk, set()), lines)
+
+    def set_chunk_lines(self, chunk, vlines, hlines, edges):
+        # Частичное обновление: edges - все рёбра чанка на локальных линиях vlines/hlines
+        ox = chunk.pos.x * chunk.size.x
+        oy = chunk.pos.y * chunk.size.y
+        keys = [(0, x + ox, n) for x in vlines for n in (-1, 1)]
+        keys += [(1, y + oy, n) for y in hlines for n in (-1, 1)]
+        self.set_lines(chunk, keys, self.chunk_lines(chunk, edges))
+
+    def remove_chunk(self, chunk):
+        keys = self.chunk_keys.pop(chunk, None)
+        if keys:
+            self.set_lines(chunk, keys, {})
+
+    def merge(self, line):
+        intervals = sorted(interval for intervals in line.values() for interval in intervals)
+        runs = []
+        for a, b in intervals:
+            if runs and a <= runs[-1][1]:
+                if b > runs[-1][1]:
+                    runs[-1][1] = b
+            else:
+                runs.append([a, b])
+        return [tuple(run) for run in runs]
+
+    def make_shape(self, key, run):
+        kind, pos, n = key
+        a, b = run
+        scale = 8 * self.game.physics_scale
+        if kind == 0:
+            p0, p1 = (pos * scale, a * scale), (pos * scale, b * scale)
+        else:
+            p0, p1 = (a * scale, pos * scale), (b * scale, pos * scale)
+        shape = pymunk.Segment(self.game.space.static_body, p0, p1, 0.5 * self.game.physics_scale)
+        shape.generated = True
+        return shape
+
+    def flush(self):
+        # Пересобирает грязные линии; порядок фиксирован, чтобы space
+        # получал формы одинаково от запуска к запуску
+        if not self.dirty:
+            return
+        space = self.game.space
+        for key in sorted(self.dirty):
+            line = self.lines.get(key)
+            new = self.merge(line) if line else []
+            old = self.runs.get(key, {})
+            shapes = {}
+            for run in new:
+                shape = old.pop(run, None)
+                if shape is None:
+                    shape = self.make_shape(key, run)
+                    space.add(shape)
+                    self.shape_count += 1
+                shapes[run] = shape
+            for shape in old.values():
+                space.remove(shape)
+                self.shape_count -= 1
+            if shapes:
+                self.runs[key] = shapes
+            else:
+                self.runs.pop(key, None)
+            self.rebuilt_lines += 1
+        self.dirty = set()
+
+    def clear(self):
+        space = self.game.space
+        for shapes in self.runs.values():
+            for shape in shapes.values():
+                space.remove(shape)
+        self.lines = {}
+        self.chunk_keys = {}
+        self.runs = {}
+        self.dirty = set()
+        self.shape_count = 0
@@ -1,21 +1,113 @@
 import pygame
-import pymunk
+import numpy as np
 from pymunk.autogeometry import march_soft
 from classes.vector import Vector2
 from classes.aabb import AABB
 from util import get_path
+from chunkmanager import ChunkManager
+from staticgeometry import StaticGeometry
+import shadows
 import math
 
-class Cell():
-
-    def __init__(self, x, y, exists, outside):
-        self.x = x
-        self.y = y
-        self.exists = exists
-        self.outside = outside
-        self.edge_exist = [False, False, False, False]
-        # LEFT RIGHT TOP BOTTOM
-        self.edge_id = [-1, -1, -1, -1]
+def line_runs(faces):
+    # faces: bool [линии, n]. Возвращает отрезки подряд идущих True как (линия, начало, конец)
+    padded = np.zeros((faces.shape[0], faces.shape[1] + 2), np.int8)
+    padded[:, 1:-1] = faces
+    diff = np.diff(padded, axis=1)
+    lines, starts = np.nonzero(diff == 1)
+    ends = np.nonzero(diff == -1)[1]
+    return zip(lines.tolist(), starts.tolist(), ends.tolist())
+
+def extract_edges(solid, vlines=None, hlines=None):
+    # solid: bool [h+2, w+2] - тайлы чанка с рамкой в одну клетку.
+    # Возвращает объединённые рёбра (x0, y0, x1, y1, nx, ny) в локальных координатах.
+    # vlines/hlines - номера вертикальных (x) и горизонтальных (y) линий сетки,
+    # которые нужно пересчитать; None - все линии чанка.
+    h, w = solid.shape[0] - 2, solid.shape[1] - 2
+    inner = solid[1:-1, 1:-1]
+    if vlines is None:
+        vlines = range(w + 1)
+    if hlines is None:
+        hlines = range(h + 1)
+
+    edges = []
+
+    # LEFT: грань на линии x у клетки x, RIGHT: на линии x+1 у клетки x
+    cols = [x for x in vlines if x < w]
+    if cols:
+        faces = (inner & ~solid[1:-1, :-2])[:, cols].T
+        edges += [(cols[i], a, cols[i], b, -1, 0) for i, a, b in line_runs(faces)]
+    cols = [x - 1 for x in vlines if x > 0]
+    if cols:
+        faces = (inner & ~solid[1:-1, 2:])[:, cols].T
+        edges += [(cols[i]+1, a, cols[i]+1, b, 1, 0) for i, a, b in line_runs(faces)]
+
+    # TOP: грань на линии y у клетки y, BOTTOM: на линии y+1 у клетки y
+    rows = [y for y in hlines if y < h]
+    if rows:
+        faces = (inner & ~solid[:-2, 1:-1])[rows, :]
+        edges += [(a, rows[i], b, rows[i], 0, -1) for i, a, b in line_runs(faces)]
+    rows = [y - 1 for y in hlines if y > 0]
+    if rows:
+        faces = (inner & ~solid[2:, 1:-1])[rows, :]
+        edges += [(a, rows[i]+1, b, rows[i]+1, 0, 1) for i, a, b in line_runs(faces)]
+
+    return edges
+
+def edge_line(edge):
+    # Линия сетки, на которой лежит ребро: (0, x) - вертикальная, (1, y) - горизонтальная
+    return (0, edge[0]) if edge[4] else (1, edge[1])
+
+def light_segment(edge, solid, ox, oy):
+    # Сегмент для теней в пикселях мира: ребро слегка сдвигается внутрь стены
+    # и удлиняется/укорачивается в зависимости от соседей на концах.
+    # solid - список строк маски чанка с рамкой, локальная клетка (x, y) - solid[y+1][x+1];
+    # ox, oy - положение чанка в тайлах
+    exists = lambda x, y: solid[y + 1][x + 1]
+    x0, y0, x1, y1, nx, ny = edge
+    adjust = 0.3
+
+    if nx == -1:
+        n0 = 1 if exists(x0, y0-1) else -1
+        n1 = 1 if exists(x1, y1) else -1
+        p0 = (x0 + adjust, y0 - n0*adjust)
+        p1 = (x1 + adjust, y1 + n1*adjust)
+
+    elif nx == 1:
+        n0 = 1 if exists(x0-1, y0-1) else -1
+        n1 = 1 if exists(x1-1, y1) else -1
+        p0 = (x0 - adjust, y0 - n0*adjust)
+        p1 = (x1 - adjust, y1 + n1*adjust)
+
+    elif ny == -1:
+        n0 = 1 if exists(x0-1, y0) else -1
+        n1 = 1 if exists(x1, y1) else -1
+        p0 = (x0 - n0*adjust, y0 + adjust)
+        p1 = (x1 + n1*adjust, y1 + adjust)
+
+    else:
+        n0 = 1 if exists(x0-1, y0-1) else -1
+        n1 = 1 if exists(x1, y1-1) else -1
+        p0 = (x0 - n0*adjust, y0 - adjust)
+        p1 = (x1 + n1*adjust, y1 - adjust)
+
+    return ((p0[0] + ox) * 8, (p0[1] + oy) * 8, (p1[0] + ox) * 8, (p1[1] + oy) * 8, nx, ny)
+
+# Подготовка данных для запекания чанка. Функции ниже не трогают pygame и pymunk,
+# получают копии массивов и поэтому могут выполняться в пуле потоков
+# (см. ChunkWorker). В главном потоке остаются только blit и Space.add.
+
+def prepare_tiles(ids, masks):
+    # Выбор автотайлов: (x, y, id, маска) для непустых клеток, x и y в пикселях чанка
+    ys, xs = np.nonzero(ids)
+    return list(zip((xs * 8).tolist(), (ys * 8).tolist(), ids[ys, xs].tolist(), masks[ys, xs].tolist()))
+
+def prepare_physics(solid, ox, oy, edges=None):
+    # Рёбра чанка вместе с сегментами для теней
+    if edges is None:
+        edges = extract_edges(solid)
+    solid = solid.tolist()
+    return [(edge, light_segment(edge, solid, ox, oy)) for edge in edges]
 
 class Chunk():
 
@@ -25,155 +117,177 @@ class Chunk():
         self.pos = pos
         self.size = size
         self.segments = []
+        self.edge_segments = {}
+        self.line_edges = {}
 
         self.baked = False
+        self.physics_dirty = set()
+        self.pending_edges = None
 
         self.surface = None
+        self.dirty = set()
+
+        # Растёт при каждом изменении тайлов, влияющем на чанк
+        self.version = 0
+        # Растёт при каждом изменении физики (и сегментов теней) чанка
+        self.physics_version = 0
+        self.occluder_array = None
+
+    def tile_snapshot(self):
+        sx = self.pos.x * self.size.x
+        sy = self.pos.y * self.size.y
+        ids = self.map.region(sx, sy, sx + self.size.x, sy + self.size.y).copy()
+        masks = self.map.masks[sy:sy + self.size.y, sx:sx + self.size.x].copy()
+        return ids, masks
 
     def bake(self):
+        self.apply_surface(prepare_tiles(*self.tile_snapshot()))
+
+    def apply_surface(self, tiles):
         self.surface = pygame.Surface((self.size * 8).list)
         self.surface.set_colorkey((0, 0, 0))
-        sx = self.pos.x * self.size.x
-        sy = self.pos.y * self.size.y
-        for x in range(0, self.size.x):
-            for y in range(0, self.size.y):
-                image = self.map.tc_image(Vector2(x+sx, y+sy))
-                if image:
-                    blit_pos = Vector2(x, y) * 8
-                    self.surface.blit(image, blit_pos.list)
+        images = self.map.tile_surfaces
+        self.surface.blits([(images[id][mask], (x, y)) for x, y, id, mask in tiles], False)
         self.surface = self.surface.convert(self.game.surface)
+        self.dirty = set()
 
-    def bake_physics(self):
-        if self.baked:
-            self.delete_physics()
+    def rebake(self):
+        # Перерисовывает только изменённые тайлы в уже существующей поверхности.
+        # Незапечённый чанк пропускается: при запекании он всё равно нарисуется целиком
+        if self.surface is None:
+            self.dirty = set()
+            return
+        if not self.dirty:
+            return
 
-        self.segments = []
-
-        def exists(x, y):
-            tile = self.map.get_tile(Vector2(x, y))
-            if tile is None:
-                return False
-            if not self.map.tilesolid.get(tile, False):
-                return False
-            return True
+        sx = self.pos.x * self.size.x
+        sy = self.pos.y * self.size.y
+        data = self.map.data
+        masks = self.map.masks
+        images = self.map.tile_surfaces
+        blits = []
+        for x, y in self.dirty:
+            self.surface.fill((0, 0, 0), (x * 8, y * 8, 8, 8))
+            id = data[sy + y, sx + x]
+            if id:
+                blits.append((images[id][masks[sy + y, sx + x]], (x * 8, y * 8)))
+        self.surface.blits(blits, False)
+        self.dirty = set()
+
+    def evict_surface(self):
+        self.surface = None
+        self.dirty = set()
 
-        cells = []
-        edges = []
+    @property
+    def edges(self):
+        return list(self.edge_segments)
 
+    def solid_mask(self):
         sx = self.pos.x * self.size.x
         sy = self.pos.y * self.size.y
-        for y in range(0, self.size.y+2):
-            row = []
-            for x in range(0, self.size.x+2):
-                row.append(Cell(
-                    x - 1, y - 1,
-                    exists(x + sx - 1, y + sy - 1),
-                    not (
-                        (0 < x < self.size.x+1) and
-                        (0 < y < self.size.y+1)
-                    )
+        return self.map.solid_mask(sx - 1, sy - 1, sx + self.size.x + 1, sy + self.size.y + 1)
+
+    def light_segment(self, edge, solid):
+        x0, y0, x1, y1, nx, ny = light_segment(edge, solid, self.pos.x * self.size.x, self.pos.y * self.size.y)
+        return [Vector2(x0, y0), Vector2(x1, y1), Vector2(nx, ny)]
+
+    def physics_changed(self):
+        self.physics_version += 1
+        self.occluder_array = None
+
+    def get_occluder_array(self):
+        # Сегменты теней для Light.project_light массивом [10, n] для shadows.py,
+        # по сегменту на столбец: (x0, y0, x1, y1, nx, ny, mx, my, dx, dy),
+        # (mx, my) - середина, (dx, dy) - округлённое направление.
+        # Считаются заново только после изменения физики чанка
+        if self.occluder_array is None:
+            occluders = []
+            for p0, p1, n in self.segments:
+                occluders.append((
+                    p0.x, p0.y, p1.x, p1.y, n.x, n.y,
+                    (p0.x + p1.x) / 2, (p0.y + p1.y) / 2,
+                    round(p1.x - p0.x), round(p1.y - p0.y)
                 ))
-            cells.append(row)
-
-        for y in range(0, self.size.y+2):
-            for x in range(0, self.size.x+2):
-                rx, ry = x-1, y-1
-                cell = cells[y][x]
-                if not cell.exists or cell.outside:
-                    continue
-
-                if not cells[y][x-1].exists:
-                    cell.edge_exist[0] = True
-                    if cells[y-1][x].edge_exist[0]:
-                        cell.edge_id[0] = cells[y-1][x].edge_id[0]
-                        edges[cell.edge_id[0]][1].y += 1
-                    else:
-                        cell.edge_id[0] = len(edges)
-                        edges.append([Vector2(rx, ry), Vector2(rx, ry+1), Vector2(-1, 0)])
-
-                if not cells[y][x+1].exists:
-                    cell.edge_exist[1] = True
-                    if cells[y-1][x].edge_exist[1]:
-                        cell.edge_id[1] = cells[y-1][x].edge_id[1]
-                        edges[cell.edge_id[1]][1].y += 1
-                    else:
-                        cell.edge_id[1] = len(edges)
-                        edges.append([Vector2(rx+1, ry), Vector2(rx+1, ry+1), Vector2(1, 0)])
-
-                if not cells[y-1][x].exists:
-                    cell.edge_exist[2] = True
-                    if cells[y][x-1].edge_exist[2]:
-                        cell.edge_id[2] = cells[y][x-1].edge_id[2]
-                        edges[cell.edge_id[2]][1].x += 1
-                    else:
-                        cell.edge_id[2] = len(edges)
-                        edges.append([Vector2(rx, ry), Vector2(rx+1, ry), Vector2(0, -1)])
-
-                if not cells[y+1][x].exists:
-                    cell.edge_exist[3] = True
-                    if cells[y][x-1].edge_exist[3]:
-                        cell.edge_id[3] = cells[y][x-1].edge_id[3]
-                        edges[cell.edge_id[3]][1].x += 1
-                    else:
-                        cell.edge_id[3] = len(edges)
-                        edges.append([Vector2(rx, ry+1), Vector2(rx+1, ry+1), Vector2(0, 1)])
-
-        self.segments = edges
-        self.cells = cells
-
-        space = self.game.space
-        self.shapes = []
-        for seg in self.segments:
-            shape = pymunk.Segment(
-                space.static_body,
-                ((seg[0] + self.pos * self.size) * 8 * self.game.physics_scale).list,
-                ((seg[1] + self.pos * self.size) * 8 * self.game.physics_scale).list,
-                0.5 * self.game.physics_scale
-            )
-            shape.generated = True
-            shape.chunk = self
-            space.add(shape)
-            self.shapes.append(shape)
-
-            adjust = 0.3
-
-            c0x = seg[0].x + 1
-            c0y = seg[0].y + 1
-
-            c1x = seg[1].x + 1
-            c1y = seg[1].y + 1
-
-            if seg[2] == Vector2(-1, 0):
-                n0 = 1 if cells[c0y-1][c0x].exists else -1
-                n1 = 1 if cells[c1y][c1x].exists else -1
-                seg[0] += Vector2(0, -n0*adjust) - seg[2]*adjust
-                seg[1] += Vector2(0, n1*adjust) - seg[2]*adjust
-
-            elif seg[2] == Vector2(1, 0):
-                n0 = 1 if cells[c0y-1][c0x-1].exists else -1
-                n1 = 1 if cells[c1y][c1x-1].exists else -1
-                seg[0] += Vector2(0, -n0*adjust) - seg[2]*adjust
-                seg[1] += Vector2(0, n1*adjust) - seg[2]*adjust
-
-            elif seg[2] == Vector2(0, -1):
-                n0 = 1 if cells[c0y][c0x-1].exists else -1
-                n1 = 1 if cells[c1y][c1x].exists else -1
-                seg[0] += Vector2(-n0*adjust, 0) - seg[2]*adjust
-                seg[1] += Vector2(n1*adjust, 0) - seg[2]*adjust
-
-            elif seg[2] == Vector2(0, 1):
-                n0 = 1 if cells[c0y-1][c0x-1].exists else -1
-                n1 = 1 if cells[c1y-1][c1x].exists else -1
-                seg[0] += Vector2(-n0*adjust, 0) - seg[2]*adjust
-                seg[1] += Vector2(n1*adjust, 0) - seg[2]*adjust
-            seg[0] = (seg[0] + self.pos * self.size) * 8
-            seg[1] = (seg[1] + self.pos * self.size) * 8
+            self.occluder_array = shadows.occluder_array(occluders)
+        return self.occluder_array
+
+    # Формы pymunk создаёт Map.static_geometry, уже объединёнными между чанками;
+    # чанк хранит только свои рёбра и сегменты теней
+
+    def add_edge(self, edge, segment):
+        self.edge_segments[edge] = segment
+        self.line_edges.setdefault(edge_line(edge), set()).add(edge)
+
+    def remove_edge(self, edge):
+        del self.edge_segments[edge]
+        self.line_edges[edge_line(edge)].discard(edge)
 
+    def bake_physics(self, edges=None):
+        if edges is None:
+            edges = self.pending_edges
+        self.apply_physics(prepare_physics(
+            self.solid_mask(), self.pos.x * self.size.x, self.pos.y * self.size.y, edges
+        ))
+
+    def apply_physics(self, physics):
+        if self.baked:
+            self.delete_physics()
+
+        for edge, seg in physics:
+            x0, y0, x1, y1, nx, ny = seg
+            self.add_edge(edge, [Vector2(x0, y0), Vector2(x1, y1), Vector2(nx, ny)])
+        self.segments = list(self.edge_segments.values())
+        self.map.static_geometry.set_chunk(self, self.edge_segments)
+        self.physics_changed()
+
+        self.pending_edges = None
+        self.physics_dirty = set()
         self.baked = True
 
+    def update_physics(self):
+        # Пересчитывает рёбра только на линиях сетки вокруг изменённых клеток
+        # (physics_dirty); static_geometry пересобирает формы только на этих линиях
+        if not self.baked:
+            self.physics_dirty = set()
+            self.pending_edges = None
+            return
+        if not self.physics_dirty:
+            return
+
+        vlines, hlines = set(), set()
+        for x, y in self.physics_dirty:
+            vlines.update(l for l in (x, x + 1) if 0 <= l <= self.size.x)
+            hlines.update(l for l in (y, y + 1) if 0 <= l <= self.size.y)
+        self.physics_dirty = set()
+
+        solid = self.solid_mask()
+        new = set(extract_edges(solid, vlines, hlines))
+        solid = solid.tolist()
+
+        old = set()
+        for x in vlines:
+            old |= self.line_edges.get((0, x), set())
+        for y in hlines:
+            old |= self.line_edges.get((1, y), set())
+
+        for edge in old - new:
+            self.remove_edge(edge)
+        for edge in new - old:
+            self.add_edge(edge, self.light_segment(edge, solid))
+        # Концы неизменившихся рёбер могли сдвинуться из-за соседей
+        for edge in old & new:
+            self.edge_segments[edge] = self.light_segment(edge, solid)
+
+        self.segments = list(self.edge_segments.values())
+        self.map.static_geometry.set_chunk_lines(self, vlines, hlines, new)
+        self.physics_changed()
+
     def delete_physics(self):
-        for s in self.shapes:
-            self.game.space.remove(s)
+        self.map.static_geometry.remove_chunk(self)
+        self.edge_segments = {}
+        self.line_edges = {}
+        self.segments = []
+        self.physics_changed()
 
         self.baked = False
 
@@ -204,9 +318,25 @@ class Map():
         self.tilecoords = {}
         self.tilesolid = {}
         self.tileinfo = {}
+
+        # Палитра: id 0 - пустота, тайл с id i хранится в data как uint8
+        self.palette = [None]
+        self.tile_ids = {}
+        self.palette_solid = np.zeros(1, bool)
+        self.palette_destructable = np.zeros(1, bool)
         self.tc_init()
 
         self.tileimages = {}
+        self.tile_surfaces = self.tc_surfaces()
+        self.masks = None
+        self.dirty_chunks = set()
+
+        self.static_geometry = StaticGeometry(self.game)
+        self.chunk_manager = ChunkManager(
+            self,
+            surface_budget=self.game.settings.chunk_memory.get() * 1024 * 1024,
+            workers=self.game.settings.chunk_workers.get()
+        )
 
     def tc_init(self):
         self.tc_add_4x4("cave_wall", (0, 0), {
@@ -223,6 +353,21 @@ class Map():
         self.tilecoords[name] = Vector2(pos[0]*8, pos[1]*8)
         self.tilesolid[name] = solid
         self.tileinfo[name] = info
+        self.tc_register(name)
+
+    def tc_register(self, name):
+        if name in self.tile_ids:
+            id = self.tile_ids[name]
+        else:
+            id = len(self.palette)
+            if id > 255:
+                raise ValueError("Too many tile types")
+            self.palette.append(name)
+            self.tile_ids[name] = id
+            self.palette_solid = np.append(self.palette_solid, False)
+            self.palette_destructable = np.append(self.palette_destructable, False)
+        self.palette_solid[id] = self.tilesolid[name]
+        self.palette_destructable[id] = self.tileinfo[name].get("destructable", True)
 
     def tc_add_4x4(self, name, pos, info=None, solid=True):
         if info is None:
@@ -246,30 +391,11 @@ class Map():
         self.tilecoords[name] = Vector2(pos[0]*8, pos[1]*8)
         self.tilesolid[name] = solid
         self.tileinfo[name] = info
+        self.tc_register(name)
 
 
-    def tc_image(self, at):
-        tile = self.get_tile(at)
-        if tile is None:
-            return None
-
-        coords = self.tilecoords.get(tile, None)
-        if coords is None:
-            return None
-
-        info = self.tileinfo.get(tile, None)
-
-        if info:
-            if info.get("4x4", False):
-                bits = 0
-                bits += (0 if (not self.get_tile(at + Vector2(-1, 0))) else 8)
-                bits += (0 if (not self.get_tile(at + Vector2(1, 0))) else 4)
-                bits += (0 if (not self.get_tile(at + Vector2(0, -1))) else 2)
-                bits += (0 if (not self.get_tile(at + Vector2(0, 1))) else 1)
-
-                coords += Vector2(bits % 4, math.floor(bits / 4)) * 8
-
-        key = str(coords.x)+"x"+str(coords.y)
+    def tc_tile_image(self, coords):
+        key = (coords.x, coords.y)
         surf = self.tileimages.get(key, None)
         if surf is None:
             tilesize = (8, 8)
@@ -278,11 +404,99 @@ class Map():
             self.tileimages[key] = surf
         return surf
 
+    def tc_surfaces(self):
+        # tile_surfaces[id][mask] - картинка тайла для маски соседей (см. compute_masks)
+        surfaces = [[None] * 16]
+        for name in self.palette[1:]:
+            coords = self.tilecoords[name]
+            if self.tileinfo[name].get("4x4", False):
+                surfaces.append([
+                    self.tc_tile_image(coords + Vector2(bits % 4, bits // 4) * 8)
+                    for bits in range(16)
+                ])
+            else:
+                surfaces.append([self.tc_tile_image(coords)] * 16)
+        return surfaces
+
+    def tc_image(self, at):
+        if not self.valid_tile(at):
+            return None
+        return self.tile_surfaces[self.data[at.y, at.x]][self.masks[at.y, at.x]]
+
+    def neighbour_masks(self, filled):
+        # Маска соседей для автотайлов 4x4: LEFT - 8, RIGHT - 4, TOP - 2, BOTTOM - 1.
+        # filled - bool [h+2, w+2] с рамкой в одну клетку
+        masks = filled[1:-1, :-2] * np.uint8(8)
+        masks |= filled[1:-1, 2:] * np.uint8(4)
+        masks |= filled[:-2, 1:-1] * np.uint8(2)
+        masks |= filled[2:, 1:-1] * np.uint8(1)
+        return masks
+
+    def compute_masks(self):
+        self.masks = self.neighbour_masks(np.pad(self.data != 0, 1, constant_values=False))
+
+    def update_masks(self, x0, y0, x1, y1):
+        # Пересчитывает маски в прямоугольнике и возвращает непустые клетки,
+        # у которых маска поменялась
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.size.x), min(y1, self.size.y)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        masks = self.neighbour_masks(self.ids_mask(x0 - 1, y0 - 1, x1 + 1, y1 + 1) != 0)
+        old = self.masks[y0:y1, x0:x1]
+        ys, xs = np.nonzero((masks != old) & (self.data[y0:y1, x0:x1] != 0))
+        old[...] = masks
+        return list(zip((xs + x0).tolist(), (ys + y0).tolist()))
+
+    def update_mask(self, x, y):
+        # Пересчитывает маску клетки и помечает её грязной, если картинка могла измениться
+        if not (0 <= x < self.size.x and 0 <= y < self.size.y):
+            return
+        mask = (
+            (8 if self.get_id(x - 1, y) else 0) |
+            (4 if self.get_id(x + 1, y) else 0) |
+            (2 if self.get_id(x, y - 1) else 0) |
+            (1 if self.get_id(x, y + 1) else 0)
+        )
+        chunk = None
+        if mask != self.masks[y, x] and self.data[y, x]:
+            chunk = self.mark_dirty(x, y)
+        self.masks[y, x] = mask
+        return chunk
+
+    def mark_dirty(self, x, y):
+        chunk = self.chunks[y // self.chunksize.y][x // self.chunksize.x]
+        chunk.dirty.add((x % self.chunksize.x, y % self.chunksize.y))
+        chunk.version += 1
+        return chunk
+
+    def mark_physics_dirty(self, x, y):
+        # Клетка влияет на рёбра всех чанков, в рамку (+1 клетка) которых она попадает
+        chunks = []
+        cw, ch = self.chunksize.x, self.chunksize.y
+        for cy in range(max((y - 1) // ch, 0), min((y + 1) // ch, self.chunk_amount.y - 1) + 1):
+            for cx in range(max((x - 1) // cw, 0), min((x + 1) // cw, self.chunk_amount.x - 1) + 1):
+                chunk = self.chunks[cy][cx]
+                chunk.physics_dirty.add((x - cx * cw, y - cy * ch))
+                chunk.pending_edges = None
+                chunk.version += 1
+                chunks.append(chunk)
+        return chunks
+
     def load_from_matrix(self, matr):
-        self.data = matr
-        self.size = Vector2(len(matr[0]), len(matr))
+        # Принимает либо массив id тайлов, либо список строк с именами тайлов
+        if isinstance(matr, np.ndarray):
+            self.data = matr.astype(np.uint8, copy=False)
+        else:
+            self.data = np.array(
+                [[self.tile_ids.get(tile, 0) for tile in row] for row in matr],
+                np.uint8
+            )
+        self.size = Vector2(self.data.shape[1], self.data.shape[0])
+        self.compute_masks()
 
     def make_chunks(self):
+        self.chunk_manager.clear()
         self.chunk_amount = math.floor(self.size / self.chunksize) + Vector2(1)
         self.chunks = []
         for y in range(self.chunk_amount.y):
@@ -293,7 +507,11 @@ class Map():
             self.chunks.append(row)
 
     def block_at(self, pos):
-        return self.data[math.floor(pos.y / 8)][math.floor(pos.x / 8)]
+        return self.palette[self.data[math.floor(pos.y / 8), math.floor(pos.x / 8)]]
+
+    def solid_at(self, pos):
+        x, y = math.floor(pos.x / 8), math.floor(pos.y / 8)
+        return self.is_solid(x, y)
 
     def test_aabb_chunks(self, aabb):
         aabb = aabb.copy()
@@ -306,10 +524,28 @@ class Map():
                     chunks.append(self.chunks[y][x])
         return chunks
 
-    def bake_all_physics(self):
+    def bake_all_physics(self, chunk_edges=None):
+        for i, chunk in enumerate(self.all_chunks()):
+            chunk.bake_physics(None if chunk_edges is None else chunk_edges[i])
+        self.static_geometry.flush()
+
+    def extract_all_edges(self):
+        # Рёбра всех чанков без создания pymunk-форм (для кэша мира)
+        chunk_edges = []
+        for chunk in self.all_chunks():
+            if chunk.pending_edges is None:
+                chunk.pending_edges = extract_edges(chunk.solid_mask())
+            chunk_edges.append(chunk.pending_edges)
+        return chunk_edges
+
+    def set_pending_edges(self, chunk_edges):
+        for chunk, edges in zip(self.all_chunks(), chunk_edges):
+            chunk.pending_edges = edges
+
+    def all_chunks(self):
         for row in self.chunks:
             for chunk in row:
-                chunk.bake_physics()
+                yield chunk
 
     def bake_all(self):
         for row in self.chunks:
@@ -325,61 +561,167 @@ class Map():
 
     def get_tile(self, at):
         if self.valid_tile(at):
-            return self.data[at.y][at.x]
+            return self.palette[self.data[at.y, at.x]]
         return None
 
+    def get_id(self, x, y):
+        if 0 <= x < self.size.x and 0 <= y < self.size.y:
+            return self.data[y, x]
+        return 0
+
+    def is_solid(self, x, y):
+        return bool(self.palette_solid[self.get_id(x, y)])
+
+    def region(self, x0, y0, x1, y1):
+        # View на id тайлов в прямоугольнике [x0, x1) x [y0, y1), обрезанном картой
+        x0, y0 = max(x0, 0), max(y0, 0)
+        return self.data[y0:max(y1, y0), x0:max(x1, x0)]
+
+    def ids_mask(self, x0, y0, x1, y1):
+        # Копия id тайлов в прямоугольнике, за пределами карты - 0
+        ids = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x1, self.size.x), min(y1, self.size.y)
+        if cx0 < cx1 and cy0 < cy1:
+            ids[cy0-y0:cy1-y0, cx0-x0:cx1-x0] = self.data[cy0:cy1, cx0:cx1]
+        return ids
+
+    def solid_mask(self, x0, y0, x1, y1):
+        return self.palette_solid[self.ids_mask(x0, y0, x1, y1)]
+
+    def destructable_mask(self, x0, y0, x1, y1):
+        return self.palette_destructable[self.ids_mask(x0, y0, x1, y1)]
+
     def remove_tile(self, at):
-        tile = self.get_tile(at)
-        if not tile:
+        id = self.get_id(at.x, at.y)
+        if not id:
             return set()
 
-        if not self.tileinfo.get(tile, {}).get("destructable", True):
+        if not self.palette_destructable[id]:
             return set()
 
-        self.data[at.y][at.x] = None
-        chunks_near_pos = [
-            math.floor((at+Vector2(-1, 0)) / self.chunksize),
-            math.floor((at+Vector2(1, 0)) / self.chunksize),
-            math.floor((at+Vector2(0, -1)) / self.chunksize),
-            math.floor((at+Vector2(0, 1)) / self.chunksize)
-        ]
-        chunks_near = set()
-        for pos in chunks_near_pos:
-            chunks_near.add(self.chunks[pos.y][pos.x])
+        self.data[at.y, at.x] = 0
+        chunks_near = {self.mark_dirty(at.x, at.y)}
+        for x, y in ((at.x, at.y), (at.x-1, at.y), (at.x+1, at.y), (at.x, at.y-1), (at.x, at.y+1)):
+            chunk = self.update_mask(x, y)
+            if chunk:
+                chunks_near.add(chunk)
+        chunks_near.update(self.mark_physics_dirty(at.x, at.y))
+        self.dirty_chunks.update(chunks_near)
         return chunks_near
 
+    # Пакетное разрушение тайлов. Координаты - в тайлах (Vector2, можно дробные).
+    # Все функции только меняют карту и копят грязные чанки; перезапекание
+    # происходит один раз за кадр в flush(). Возвращают число убранных тайлов.
+
+    def carve(self, x0, y0, mask):
+        # mask - bool [h, w], левый верхний угол в клетке (x0, y0)
+        h, w = mask.shape
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x0 + w, self.size.x), min(y0 + h, self.size.y)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return 0
+
+        ids = self.data[cy0:cy1, cx0:cx1]
+        remove = mask[cy0-y0:cy1-y0, cx0-x0:cx1-x0] & self.palette_destructable[ids]
+        ys, xs = np.nonzero(remove)
+        if len(xs) == 0:
+            return 0
+        ids[remove] = 0
+        xs += cx0
+        ys += cy0
+
+        dirty = self.dirty_chunks
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            dirty.add(self.mark_dirty(x, y))
+            dirty.update(self.mark_physics_dirty(x, y))
+        for x, y in self.update_masks(int(xs.min()) - 1, int(ys.min()) - 1, int(xs.max()) + 2, int(ys.max()) + 2):
+            dirty.add(self.mark_dirty(x, y))
+        return len(xs)
+
+    def carve_cells(self, cells):
+        # cells - список (x, y) или Vector2 целых клеток, повторы допустимы
+        if not cells:
+            return 0
+        cells = np.array([(c[0], c[1]) for c in cells], np.int64)
+        x0, y0 = cells.min(axis=0).tolist()
+        x1, y1 = cells.max(axis=0).tolist()
+        mask = np.zeros((y1 - y0 + 1, x1 - x0 + 1), bool)
+        mask[cells[:, 1] - y0, cells[:, 0] - x0] = True
+        return self.carve(x0, y0, mask)
+
+    def carve_circle(self, center, radius):
+        return self.carve_capsule(center, center, radius)
+
+    def carve_capsule(self, a, b, radius):
+        # Клетки, центр которых ближе radius к отрезку a-b
+        x0 = math.floor(min(a.x, b.x) - radius)
+        y0 = math.floor(min(a.y, b.y) - radius)
+        x1 = math.floor(max(a.x, b.x) + radius) + 1
+        y1 = math.floor(max(a.y, b.y) + radius) + 1
+        ys, xs = np.mgrid[y0:y1, x0:x1]
+        px = xs + 0.5 - a.x
+        py = ys + 0.5 - a.y
+        dx, dy = b.x - a.x, b.y - a.y
+        length = dx * dx + dy * dy
+        if length > 0:
+            t = np.clip((px * dx + py * dy) / length, 0, 1)
+            px = px - t * dx
+            py = py - t * dy
+        return self.carve(x0, y0, px * px + py * py <= radius * radius)
+
+    def carve_line(self, a, b):
+        # Все клетки, через которые проходит отрезок a-b: обход сетки
+        # (Amanatides-Woo). Через угол клетки - обе соседние, без диагональных щелей
+        x, y = math.floor(a.x), math.floor(a.y)
+        dx, dy = b.x - a.x, b.y - a.y
+        sx = 1 if dx > 0 else -1
+        sy = 1 if dy > 0 else -1
+        # t вдоль отрезка до следующей границы по x / y и шаг t на одну клетку
+        tx = ((x + 1 - a.x) if dx > 0 else (a.x - x)) / abs(dx) if dx else math.inf
+        ty = ((y + 1 - a.y) if dy > 0 else (a.y - y)) / abs(dy) if dy else math.inf
+        step_x = 1 / abs(dx) if dx else math.inf
+        step_y = 1 / abs(dy) if dy else math.inf
+
+        cells = [(x, y)]
+        left = abs(math.floor(b.x) - x) + abs(math.floor(b.y) - y)
+        while left > 0:
+            if tx < ty:
+                x += sx
+                tx += step_x
+                left -= 1
+            elif ty < tx:
+                y += sy
+                ty += step_y
+                left -= 1
+            else:
+                cells.append((x + sx, y))
+                cells.append((x, y + sy))
+                x += sx
+                y += sy
+                tx += step_x
+                ty += step_y
+                left -= 2
+            cells.append((x, y))
+        return self.carve_cells(cells)
+
+    def flush(self):
+        # Перезапекает все чанки, изменённые с прошлого кадра
+        # По порядку на карте, а не по id() - физика должна меняться одинаково
+        for chunk in sorted(self.dirty_chunks, key=lambda chunk: (chunk.pos.y, chunk.pos.x)):
+            chunk.rebake()
+            chunk.update_physics()
+        self.dirty_chunks = set()
+
     def event(self, ev):
         pass
 
     def update(self, dt):
-        """
-        if self.game.input.mouse_pressed()[0]:
-            p_pos = self.game.game_state().player.pos
-            chunk_pos = math.floor(p_pos / self.chunksize / 8)
-            chunk = self.chunks[chunk_pos.y][chunk_pos.x]
-
-            m_pos = self.game.camera.to_world(self.game.input.mouse_pos())
-            m_pos = math.floor(m_pos / 8)
-            block_pos = m_pos - chunk_pos * self.chunksize
-
-            cell = chunk.cells[block_pos.y+1][block_pos.x+1]
-            for i in range(4):
-                if cell.edge_id[i]>-1:
-                    p1 = chunk.segments[cell.edge_id[i]][0] / 8 - chunk.pos * chunk.size
-                    p2 = chunk.segments[cell.edge_id[i]][1] / 8 - chunk.pos * chunk.size
-                    print(p1, p2)
-                else:
-                    print("None")
-            print(block_pos, cell.exists, cell.outside, chunk.pos)
-        """
+        self.flush()
+        gstate = self.game.game_state()
+        self.chunk_manager.update(self.game.camera.get_view(), gstate.entities.get_active())
 
     def draw(self, surface):
-        for y, row in enumerate(self.chunks):
-            for x, chunk in enumerate(row):
-                p = Vector2(x * self.chunksize.x, y * self.chunksize.y) * 8
-                aabb = AABB(
-                    p,
-                    p + self.chunksize * 8
-                )
-                if self.game.camera.get_view().intersect(aabb):
-                    chunk.draw(surface, self.game.camera.to_screen(p))
+        for chunk in self.test_aabb_chunks(self.game.camera.get_view()):
+            p = chunk.pos * chunk.size * 8
+            chunk.draw(surface, self.game.camera.to_screen(p))
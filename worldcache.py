@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from util import get_path
+
+# Кэш сгенерированных миров на диске.
+#
+# Ключ - хэш от параметров генерации, FORMAT_VERSION и описания тайлов
+# из Map.tc_init (имена, координаты в тайлсете, solid, info). Если поменять
+# тайлы в tc_init, поменяется ключ, и старые записи просто перестанут
+# находиться; лишние записи удаляются по времени изменения (max_entries).
+# FORMAT_VERSION нужно увеличивать при изменении формата файлов или
+# алгоритма извлечения рёбер.
+#
+# Запись - папка с тремя .npy файлами, которые читаются через mmap:
+#   tiles.npy   - uint8 [h, w], Map.data (id тайлов из Map.palette)
+#   edges.npy   - int16 [n, 6], рёбра всех чанков (x0, y0, x1, y1, nx, ny)
+#   offsets.npy - int32 [chunks + 1], рёбра чанка i - edges[offsets[i]:offsets[i+1]]
+
+FORMAT_VERSION = 1
+
+class WorldCache():
+
+    def __init__(self, path=None, max_entries=8):
+        self.path = path or get_path("cache/worlds")
+        self.max_entries = max_entries
+
+    def tile_signature(self, map):
+        signature = []
+        for name in map.tilecoords:
+            signature.append([
+                name,
+                map.tilecoords[name].list,
+                map.tilesolid[name],
+                sorted(map.tileinfo[name].items())
+            ])
+        return signature
+
+    def key(self, map, params):
+        data = json.dumps([FORMAT_VERSION, params, self.tile_signature(map)])
+        return hashlib.sha1(data.encode()).hexdigest()[:20]
+
+    def load(self, map, params):
+        folder = os.path.join(self.path, self.key(map, params))
+        try:
+            # copy-on-write: карту можно менять, файл при этом не трогается
+            tiles = np.load(os.path.join(folder, "tiles.npy"), mmap_mode="c")
+            edges = np.load(os.path.join(folder, "edges.npy"), mmap_mode="r")
+            offsets = np.load(os.path.join(folder, "offsets.npy"))
+        except (OSError, ValueError):
+            return None
+
+        map.load_from_matrix(tiles)
+        map.make_chunks()
+        if len(offsets) != map.chunk_amount.x * map.chunk_amount.y + 1:
+            return None
+
+        chunk_edges = []
+        for i in range(len(offsets) - 1):
+            chunk_edges.append([tuple(e) for e in edges[offsets[i]:offsets[i+1]].tolist()])
+        return chunk_edges
+
+    def save(self, map, params):
+        key = self.key(map, params)
+        folder = os.path.join(self.path, key)
+        tmp = folder + ".tmp"
+
+        offsets = [0]
+        edges = []
+        for chunk_edges in map.extract_all_edges():
+            edges.extend(chunk_edges)
+            offsets.append(len(edges))
+
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            np.save(os.path.join(tmp, "tiles.npy"), map.data)
+            np.save(os.path.join(tmp, "edges.npy"), np.array(edges, np.int16).reshape(-1, 6))
+            np.save(os.path.join(tmp, "offsets.npy"), np.array(offsets, np.int32))
+            if os.path.isdir(folder):
+                shutil.rmtree(folder)
+            os.replace(tmp, folder)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.prune(keep=key)
+
+    def prune(self, keep=None):
+        try:
+            entries = [
+                os.path.join(self.path, name) for name in os.listdir(self.path)
+                if name != keep and os.path.isdir(os.path.join(self.path, name))
+            ]
+        except OSError:
+            return
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for folder in entries[max(self.max_entries - 1, 0):]:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,57 @@
+import numpy as np
+import random
+
+# Клеточный автомат пещер на NumPy: соседи считаются сдвигами массива,
+# а не вложенными циклами. Шум берётся из своего random.Random(seed):
+# последовательность та же, что у старого random.seed(seed), поэтому карта
+# та же, а общий random (им пользуется ИИ) генерация не трогает.
+
+def count_neighbours(walls):
+    # Клетки за границей карты считаются стенами
+    padded = np.pad(walls, 1, constant_values=True).astype(np.uint8)
+    h, w = walls.shape
+    count = np.zeros((h, w), np.uint8)
+    for dy in range(3):
+        for dx in range(3):
+            if dx == 1 and dy == 1:
+                continue
+            count += padded[dy:dy+h, dx:dx+w]
+    return count
+
+def generate_walls(size=(128, 256), fill=0.5, seed=None, iterations=7, wall_thickness=(8, 8)):
+    rng = random.Random(seed)
+
+    gensize = size[0] // 2, size[1]
+    noise = np.fromiter(
+        (rng.random() for _ in range(gensize[0] * gensize[1])),
+        np.float64, gensize[0] * gensize[1]
+    ).reshape(gensize[1], gensize[0])
+    walls = noise < fill
+
+    xs = np.arange(gensize[0])
+    ys = np.arange(gensize[1])
+    walls[:, (xs < wall_thickness[0]) | (xs >= size[0] - wall_thickness[0])] = True
+    walls[(ys < wall_thickness[1]) | (ys >= size[1] - wall_thickness[1]), :] = True
+
+    for i in range(iterations):
+        count = count_neighbours(walls)
+        walls = np.where(count > 4, True, np.where(count < 4, False, walls))
+
+    return walls
+
+def generate_cave(size=(128, 256), fill=0.5, seed=None, iterations=7, wall_thickness=(8, 8), border_thickness=(4, 4), wall_id=1, border_id=2):
+    # Возвращает uint8 массив id тайлов для Map.load_from_matrix
+    walls = generate_walls(size, fill, seed, iterations, wall_thickness)
+
+    xs = np.arange(size[0])
+    ys = np.arange(size[1])
+    border = (
+        ((xs < border_thickness[0]) | (xs > size[0] - border_thickness[0]))[np.newaxis, :] |
+        ((ys < border_thickness[1]) | (ys > size[1] - border_thickness[1]))[:, np.newaxis]
+    )
+    cave = walls[:, np.minimum(xs // 2, walls.shape[1] - 1)]
+
+    tiles = np.zeros((size[1], size[0]), np.uint8)
+    tiles[cave] = wall_id
+    tiles[border] = border_id
+    return tiles